@@ -0,0 +1,95 @@
+"""Race-free bed allocation.
+
+Every claim is a single statement that only succeeds while the bed is still
+available, so two receptionists admitting at the same moment can never be
+given the same bed. Claims run inside the caller's transaction; the caller
+commits together with the patient update.
+"""
+import time
+
+from mysql.connector import Error
+
+# Department -> preferred ward. Anything else goes to the general ward.
+WARD_MAPPING = {
+    'ICU': 'ICU',
+    'Cardiology': 'Cardiology Ward',
+    'Orthopedics': 'Orthopedic Ward',
+    'Neurology': 'Neurology Ward',
+    'Pediatrics': 'Pediatric Ward',
+    'Emergency': 'Emergency Ward'
+}
+FALLBACK_WARD = 'General Ward'
+
+# Deadlock / lock wait timeout: the statement (or transaction) can be retried.
+RETRYABLE_ERRORS = {1205, 1213}
+
+
+def ward_for_department(department):
+    return WARD_MAPPING.get(department, FALLBACK_WARD)
+
+
+def preferred_wards(department):
+    """Wards to try in order: the department's ward, then the general ward."""
+    ward = ward_for_department(department)
+    return [ward] if ward == FALLBACK_WARD else [ward, FALLBACK_WARD]
+
+
+def claim_bed(db, patient_id, wards, attempts=5):
+    """Reserve the first available bed in ``wards`` (in preference order).
+
+    Uses one conditional ``UPDATE ... ORDER BY ... LIMIT 1``: InnoDB re-checks
+    ``status`` on the locked row, so a bed taken by a concurrent transaction
+    is skipped rather than double-booked. ``LAST_INSERT_ID(bed_id)`` hands
+    back which bed was claimed without a second lookup by status.
+
+    Returns ``{'bed_id', 'bed_name', 'ward'}`` or None when no bed is free.
+    Must be the first write of the caller's transaction so that a deadlock
+    retry doesn't discard earlier work.
+    """
+    placeholders = ', '.join(['%s'] * len(wards))
+    sql = f"""
+        UPDATE beds
+        SET status = 'Occupied', patient_id = %s, allocation_date = CURRENT_TIMESTAMP,
+            bed_id = LAST_INSERT_ID(bed_id)
+        WHERE status = 'Available' AND ward IN ({placeholders})
+        ORDER BY FIELD(ward, {placeholders}), bed_id
+        LIMIT 1
+    """
+    params = [patient_id] + list(wards) + list(wards)
+
+    cursor = db.cursor(dictionary=True)
+    try:
+        for attempt in range(attempts):
+            try:
+                cursor.execute(sql, params)
+                if cursor.rowcount != 1:
+                    return None
+                cursor.execute("SELECT bed_id, bed_name, ward FROM beds WHERE bed_id = LAST_INSERT_ID()")
+                return cursor.fetchone()
+            except Error as e:
+                if getattr(e, 'errno', None) not in RETRYABLE_ERRORS or attempt == attempts - 1:
+                    raise
+                db.rollback()
+                time.sleep(0.01 * (attempt + 1))
+    finally:
+        cursor.close()
+
+
+def claim_specific_bed(cursor, column, value, patient_id=None):
+    """Mark one named bed occupied only if it is still available.
+
+    ``column`` is ``'bed_id'`` or ``'bed_name'``. Returns True when this
+    transaction won the bed, False when it was already taken or doesn't exist.
+    """
+    if column not in ('bed_id', 'bed_name'):
+        raise ValueError(f"unsupported bed column {column!r}")
+    cursor.execute(
+        f"""
+        UPDATE beds
+        SET status = 'Occupied', patient_id = %s, allocation_date = CURRENT_TIMESTAMP
+        WHERE {column} = %s AND status = 'Available'
+        """,
+        (patient_id, value)
+    )
+    return cursor.rowcount == 1
+
@@ -0,0 +1,469 @@
+"""Load test for the hot endpoints.
+
+Two commands:
+
+    python benchmark.py seed --patients 1000000 --appointments 5000000 --beds 500 --reset
+    python benchmark.py run --clients 60 --duration 120 --out bench.json
+
+``seed`` fills the configured database (MYSQL_URL, see app.py) with
+synthetic, reproducible volumes. Use a dedicated database: ``--reset``
+empties the tables first.
+
+``run`` replays what open browser tabs do: every simulated client keeps one
+screen open and polls the same endpoints at the same intervals as its
+template (the OPD queue every 10 s, the bed board every 15 s, ...), while
+writer threads register and admit patients at a fixed rate. Requests go
+through the app in-process, or to a running deployment with ``--url``.
+Latency is measured per request at the client; SQL counts per request come
+from the difference of ``/metrics`` before and after the run. Results are
+printed and, with ``--out``, saved as JSON (with the git commit) so runs
+can be compared across commits.
+
+Sample tokens and patient ids are read from the configured database, so
+with ``--url`` point MYSQL_URL at the deployment's database too.
+"""
+import http.cookiejar
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+
+import click
+
+from bed_allocator import WARD_MAPPING, FALLBACK_WARD
+
+DEPARTMENTS = ('General Ward', 'ICU', 'Cardiology', 'Orthopedics', 'Neurology', 'Pediatrics', 'OPD', 'Emergency')
+FIRST_NAMES = ('Aarav', 'Vivaan', 'Aditya', 'Diya', 'Ananya', 'Ishaan', 'Kavya', 'Meera', 'Rohan', 'Saanvi',
+               'Arjun', 'Priya', 'Rahul', 'Sneha', 'Vikram', 'Neha', 'Karan', 'Pooja', 'Amit', 'Riya')
+LAST_NAMES = ('Sharma', 'Verma', 'Patel', 'Reddy', 'Iyer', 'Nair', 'Gupta', 'Singh', 'Das', 'Mehta',
+              'Joshi', 'Rao', 'Kulkarni', 'Chopra', 'Bose', 'Menon', 'Pillai', 'Kapoor', 'Jain', 'Shah')
+
+# (path template, poll interval in seconds) per screen, as the templates poll.
+SCREENS = {
+    'opd-queue': [('/api/opd-queue?department={department}', 10)],
+    'bed-board': [('/api/all-beds', 15)],
+    'hospital-dashboard': [('/api/dashboard-summary', 10)],
+    'patient-dashboard': [('/api/dashboard/summary-public', 10)],
+    'my-appointment': [('/api/queue-status-by-token?token={token}', 10)],
+    'bed-management': [('/api/all-beds', 30), ('/api/waiting-patients', 30)],
+}
+# How many of every 20 clients look at each screen
+SCREEN_MIX = ['opd-queue'] * 6 + ['bed-board'] * 3 + ['hospital-dashboard'] * 4 + \
+             ['patient-dashboard'] * 3 + ['my-appointment'] * 3 + ['bed-management']
+
+
+# ==================== SEED ====================
+def _bulk_insert(cursor, table, columns, rows):
+    row_sql = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    cursor.execute(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ', '.join([row_sql] * len(rows)),
+        [value for row in rows for value in row]
+    )
+
+
+def _batches(total, size):
+    done = 0
+    while done < total:
+        yield done, min(size, total - done)
+        done += size
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option('--patients', default=100000, show_default=True)
+@click.option('--appointments', default=500000, show_default=True)
+@click.option('--beds', default=500, show_default=True)
+@click.option('--waiting', default=300, show_default=True, help='Patients currently in the OPD queue.')
+@click.option('--days', default=365, show_default=True, help='Spread registrations over this many days.')
+@click.option('--batch', default=5000, show_default=True, help='Rows per INSERT.')
+@click.option('--seed', 'rng_seed', default=42, show_default=True)
+@click.option('--reset', is_flag=True, help='Empty the tables first.')
+@click.option('--yes', is_flag=True, help="Don't ask before --reset.")
+def seed(patients, appointments, beds, waiting, days, batch, rng_seed, reset, yes):
+    """Fill the database with synthetic patients, appointments, queue and beds."""
+    from app import DB_CONFIG, ensure_schema_current, get_db, patient_created_column, rebuild_rollups, SCHEMA
+
+    ensure_schema_current()
+    rng = random.Random(rng_seed)
+    db = get_db()
+    if not db:
+        raise SystemExit('Database connection failed')
+    cursor = db.cursor()
+    try:
+        if reset:
+            if not yes:
+                click.confirm(f"Empty patients, appointments, queue and beds in {DB_CONFIG['database']}?", abort=True)
+            for table in ('patient_appointments', 'opd_queue', 'beds', 'patients', 'live_events', 'daily_rollups'):
+                cursor.execute(f"TRUNCATE TABLE {table}")
+        cursor.execute("SET unique_checks = 0")
+
+        wards = sorted(set(WARD_MAPPING.values()) | {FALLBACK_WARD})
+        admitted = beds * 6 // 10
+        bed_rows = [
+            (f"BENCH-{i + 1:04d}", wards[i % len(wards)], 'Occupied' if i < admitted else 'Available')
+            for i in range(beds)
+        ]
+        for start, count in _batches(len(bed_rows), batch):
+            _bulk_insert(cursor, 'beds', ['bed_name', 'ward', 'status'], bed_rows[start:start + count])
+        db.commit()
+        click.echo(f"🛏️  {beds} beds")
+
+        created_col = patient_created_column()
+        optional = [c for c in ('gender', 'blood_group') if SCHEMA.has_column('patients', c)]
+        now = datetime.now()
+        cursor.execute("SELECT COALESCE(MAX(patient_id), 0) FROM patients")
+        first_id = int(cursor.fetchone()[0]) + 1
+        started = time.monotonic()
+        for start, count in _batches(patients, batch):
+            rows = []
+            for i in range(start, start + count):
+                # The newest patients are the ones in the queue or in a bed
+                newest = patients - i
+                if newest <= waiting:
+                    status = 'Waiting'
+                elif newest <= waiting + admitted:
+                    status = 'Admitted'
+                else:
+                    status = rng.choice(('Registered', 'Discharged', 'Discharged', 'Registered', 'Registered'))
+                registered = now - timedelta(days=days * (1 - i / float(patients)), minutes=rng.randint(0, 600))
+                row = [
+                    f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", rng.randint(1, 90),
+                    f"9{rng.randint(100000000, 999999999)}", rng.choice(DEPARTMENTS), status,
+                    registered.strftime('%Y-%m-%d %H:%M:%S'),
+                ]
+                if 'gender' in optional:
+                    row.append(rng.choice(('Male', 'Female')))
+                if 'blood_group' in optional:
+                    row.append(rng.choice(('A+', 'B+', 'O+', 'AB+', 'O-')))
+                rows.append(row)
+            _bulk_insert(cursor, 'patients', ['name', 'age', 'phone', 'department', 'status', created_col] + optional, rows)
+            db.commit()
+            if (start // batch) % 20 == 0:
+                click.echo(f"👥 {start + count}/{patients} patients ({time.monotonic() - started:.0f}s)")
+
+        last_id = first_id + patients - 1
+        cursor.execute(
+            "SELECT patient_id, department FROM patients WHERE status = 'Waiting' AND patient_id >= %s",
+            (first_id,)
+        )
+        queue_rows = [(pid, dept, 'waiting', pid) for pid, dept in cursor.fetchall()]
+        for start, count in _batches(len(queue_rows), batch):
+            _bulk_insert(cursor, 'opd_queue', ['patient_id', 'department', 'status', 'token'], queue_rows[start:start + count])
+        cursor.execute(
+            """
+            UPDATE beds b
+            JOIN (SELECT patient_id, ROW_NUMBER() OVER (ORDER BY patient_id) AS n
+                  FROM patients WHERE status = 'Admitted' AND patient_id >= %s) p
+              ON b.bed_name = CONCAT('BENCH-', LPAD(p.n, 4, '0'))
+            SET b.patient_id = p.patient_id
+            """,
+            (first_id,)
+        )
+        cursor.execute(
+            """
+            UPDATE patients p JOIN beds b ON b.patient_id = p.patient_id
+            SET p.bed_id = b.bed_name
+            WHERE p.patient_id >= %s
+            """,
+            (first_id,)
+        )
+        db.commit()
+        click.echo(f"🧾 {len(queue_rows)} queued, {admitted} admitted")
+
+        started = time.monotonic()
+        for start, count in _batches(appointments, batch):
+            rows = []
+            for i in range(start, start + count):
+                patient_id = rng.randint(first_id, last_id)
+                day = now - timedelta(days=rng.randint(0, days))
+                rows.append((
+                    patient_id, str(100000 + i), rng.choice(DEPARTMENTS), day.strftime('%Y-%m-%d'),
+                    f"{rng.randint(8, 17):02d}:{rng.choice(('00', '15', '30', '45'))}:00",
+                    rng.choice(('Completed', 'Completed', 'Completed', 'Cancelled', 'Waiting')), 0,
+                ))
+            _bulk_insert(cursor, 'patient_appointments', [
+                'patient_id', 'token_number', 'department', 'appointment_date',
+                'appointment_time', 'status', 'queue_position'
+            ], rows)
+            db.commit()
+            if (start // batch) % 20 == 0:
+                click.echo(f"📅 {start + count}/{appointments} appointments ({time.monotonic() - started:.0f}s)")
+
+        cursor.execute("SET unique_checks = 1")
+        for table in ('patients', 'patient_appointments', 'opd_queue', 'beds'):
+            cursor.execute(f"ANALYZE TABLE {table}")
+            cursor.fetchall()
+    finally:
+        cursor.close()
+        db.close()
+
+    db = get_db()
+    try:
+        rebuild_rollups(db, created_col, SCHEMA.first_column('patients', ('updated_at',)), log=click.echo)
+    finally:
+        db.close()
+    click.echo("✅ Seed complete")
+
+
+# ==================== RUN ====================
+class LocalClient:
+    """Requests through the Flask test client, logged in as an admin."""
+
+    def __init__(self):
+        from app import app
+        self._client = app.test_client()
+        with self._client.session_transaction() as sess:
+            sess['username'] = 'benchmark'
+            sess['role'] = 'Admin'
+            sess['view_role'] = 'hospital'
+
+    def request(self, method, path, data=None):
+        response = self._client.open(path, method=method, data=data)
+        body = response.get_data()
+        response.close()
+        return response.status_code, body
+
+
+class HttpClient:
+    """Requests to a running deployment, logged in through /login."""
+
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url.rstrip('/')
+        self._opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        self.request('POST', '/login', {'username': username, 'password': password, 'role': 'Admin'})
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self._opener.open(req, timeout=30) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+        except OSError:
+            return 599, b''
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    # nearest rank
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def parse_metrics(text):
+    """{endpoint: {'queries', 'sql_seconds', 'rows', 'requests'}} from /metrics."""
+    series = {
+        'mediflow_sql_queries_per_request_sum': 'queries',
+        'mediflow_sql_queries_per_request_count': 'requests',
+        'mediflow_sql_seconds_total': 'sql_seconds',
+        'mediflow_sql_rows_fetched_total': 'rows',
+    }
+    found = {}
+    for line in text.splitlines():
+        match = re.match(r'^(\w+)\{endpoint="([^"]*)"\} (\S+)$', line)
+        if match and match.group(1) in series:
+            found.setdefault(match.group(2), {})[series[match.group(1)]] = float(match.group(3))
+    return found
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}    # name -> [seconds]
+        self.errors = {}
+        self.paths = {}      # name -> a path it was requested with
+
+    def add(self, name, path, seconds, ok):
+        with self._lock:
+            self.samples.setdefault(name, []).append(seconds)
+            self.paths.setdefault(name, path.split('?')[0])
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def _timed(client, recorder, name, method, path, data=None):
+    started = time.perf_counter()
+    status, _ = client.request(method, path, data)
+    recorder.add(name, path, time.perf_counter() - started, status < 400)
+    return status
+
+
+def _sample_values():
+    """A department, a real token and waiting patient ids to drive requests with."""
+    from app import get_db
+    db = get_db()
+    if not db:
+        raise SystemExit('Database connection failed')
+    try:
+        cursor = db.cursor()
+        cursor.execute("SELECT token_number FROM patient_appointments ORDER BY id DESC LIMIT 200")
+        tokens = [row[0] for row in cursor.fetchall() if row[0]] or ['0']
+        cursor.execute("SELECT patient_id FROM patients WHERE status = 'Waiting' ORDER BY patient_id DESC LIMIT 5000")
+        waiting = [row[0] for row in cursor.fetchall()]
+        volumes = {}
+        for table in ('patients', 'patient_appointments', 'opd_queue', 'beds'):
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            volumes[table] = int(cursor.fetchone()[0])
+        cursor.close()
+    finally:
+        db.close()
+    return tokens, waiting, volumes
+
+
+@cli.command()
+@click.option('--clients', default=60, show_default=True, help='Simulated open browser tabs.')
+@click.option('--duration', default=60, show_default=True, help='Seconds to run.')
+@click.option('--time-scale', default=1.0, show_default=True, help='Poll this many times faster than the templates do.')
+@click.option('--registrations-per-minute', default=30.0, show_default=True)
+@click.option('--admissions-per-minute', default=6.0, show_default=True)
+@click.option('--url', help='Benchmark a running deployment instead of the app in-process.')
+@click.option('--username', default='admin', show_default=True)
+@click.option('--password', default='admin123', show_default=True)
+@click.option('--out', type=click.Path(dir_okay=False), help='Write results as JSON.')
+@click.option('--seed', 'rng_seed', default=42, show_default=True)
+def run(clients, duration, time_scale, registrations_per_minute, admissions_per_minute,
+        url, username, password, out, rng_seed):
+    """Replay the dashboards' polling mix plus registrations and admissions."""
+    from app import app
+
+    def new_client():
+        return HttpClient(url, username, password) if url else LocalClient()
+
+    tokens, waiting, volumes = _sample_values()
+    rng = random.Random(rng_seed)
+    recorder = Recorder()
+    stop = threading.Event()
+    before = parse_metrics(new_client().request('GET', '/metrics')[1].decode())
+
+    def poller(screen, department, token):
+        client = new_client()
+        polls = [
+            (path.split('?')[0], path.format(department=urllib.parse.quote(department), token=token), interval / time_scale)
+            for path, interval in SCREENS[screen]
+        ]
+        # Tabs weren't all opened at the same instant
+        due = [time.monotonic() + random.uniform(0, interval) for _, _, interval in polls]
+        while not stop.is_set():
+            i = min(range(len(polls)), key=due.__getitem__)
+            if stop.wait(max(0.0, due[i] - time.monotonic())):
+                break
+            name, path, interval = polls[i]
+            _timed(client, recorder, f"GET {name}", 'GET', path)
+            due[i] += interval
+
+    def writer(per_minute, action):
+        if per_minute <= 0:
+            return
+        client = new_client()
+        interval = 60.0 / per_minute
+        while not stop.wait(random.expovariate(1.0 / interval)):
+            action(client)
+
+    def register(client):
+        _timed(client, recorder, 'POST /patient-registration', 'POST', '/patient-registration', {
+            'name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            'age': str(rng.randint(1, 90)),
+            'department': rng.choice(DEPARTMENTS),
+            'phone': f"9{rng.randint(100000000, 999999999)}",
+        })
+
+    def admit(client):
+        if waiting:
+            _timed(client, recorder, 'POST /admit-patient', 'POST', f"/admit-patient/{waiting.pop()}")
+
+    threads = [
+        threading.Thread(target=poller, args=(
+            SCREEN_MIX[i % len(SCREEN_MIX)], DEPARTMENTS[i % len(DEPARTMENTS)], tokens[i % len(tokens)]
+        ), daemon=True)
+        for i in range(clients)
+    ]
+    threads.append(threading.Thread(target=writer, args=(registrations_per_minute, register), daemon=True))
+    threads.append(threading.Thread(target=writer, args=(admissions_per_minute, admit), daemon=True))
+    click.echo(f"🚦 {clients} clients for {duration}s against {url or 'the app in-process'}...")
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=30)
+    elapsed = time.monotonic() - started
+    after = parse_metrics(new_client().request('GET', '/metrics')[1].decode())
+
+    adapter = app.url_map.bind('localhost')
+    results = {}
+    for name, samples in sorted(recorder.samples.items()):
+        try:
+            endpoint = adapter.match(recorder.paths[name], method=name.split(' ')[0])[0]
+        except Exception:
+            endpoint = None
+        sql = {}
+        if endpoint in after:
+            delta = {k: after[endpoint].get(k, 0) - before.get(endpoint, {}).get(k, 0) for k in after[endpoint]}
+            served = delta.get('requests') or 0
+            if served:
+                sql = {
+                    'sql_per_request': round(delta.get('queries', 0) / served, 2),
+                    'sql_ms_per_request': round(delta.get('sql_seconds', 0) * 1000 / served, 3),
+                    'rows_per_request': round(delta.get('rows', 0) / served, 1),
+                }
+        ordered = sorted(samples)
+        results[name] = dict({
+            'requests': len(samples),
+            'errors': recorder.errors.get(name, 0),
+            'throughput_rps': round(len(samples) / elapsed, 2),
+            'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+            'max_ms': round(ordered[-1] * 1000, 2),
+        }, **sql)
+
+    total = sum(r['requests'] for r in results.values())
+    click.echo(f"\n{'endpoint':<40} {'reqs':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'sql/req':>8}")
+    for name, r in results.items():
+        click.echo(
+            f"{name:<40} {r['requests']:>7} {r['errors']:>5} {r['throughput_rps']:>8} {r['p50_ms']:>8} "
+            f"{r['p95_ms']:>8} {r['p99_ms']:>8} {r.get('sql_per_request', '-'):>8}"
+        )
+    click.echo(f"\n📈 {total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+
+    if out:
+        try:
+            commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+        except OSError:
+            commit = None
+        with open(out, 'w') as f:
+            json.dump({
+                'commit': commit,
+                'started_at': datetime.now().isoformat(timespec='seconds'),
+                'target': url or 'in-process',
+                'config': {
+                    'clients': clients, 'duration': duration, 'time_scale': time_scale,
+                    'registrations_per_minute': registrations_per_minute,
+                    'admissions_per_minute': admissions_per_minute, 'seed': rng_seed,
+                },
+                'volumes': volumes,
+                'elapsed_seconds': round(elapsed, 2),
+                'total_requests': total,
+                'throughput_rps': round(total / elapsed, 2),
+                'endpoints': results,
+            }, f, indent=2)
+        click.echo(f"💾 Results written to {out}")
+
+
+if __name__ == '__main__':
+    cli()
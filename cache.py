@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Small in-process cache with per-entry expiry and single-flight loading.
+
+    Values live for ``ttl`` seconds. ``get_or_load`` makes sure only one
+    thread recomputes an expired key while the others wait for its result.
+    With ``max_entries`` the cache is a bounded LRU: expired entries are
+    dropped first, then the least recently used ones. Use it whenever keys
+    come from request input.
+    """
+
+    def __init__(self, ttl=5.0, max_entries=None):
+        self.ttl = float(ttl)
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return bool(entry) and entry[1] > time.monotonic()
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry and entry[1] > time.monotonic():
+            self.hits += 1
+            if self.max_entries is not None:
+                with self._lock:
+                    if key in self._data:
+                        self._data.move_to_end(key)
+            return entry[0]
+        self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        now = time.monotonic()
+        expires = now + (self.ttl if ttl is None else float(ttl))
+        with self._lock:
+            self._data[key] = (value, expires)
+            if self.max_entries is not None:
+                self._data.move_to_end(key)
+                if len(self._data) > self.max_entries:
+                    self._prune(now)
+
+    def _prune(self, now):
+        for key in [k for k, entry in self._data.items() if entry[1] <= now]:
+            del self._data[key]
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Return the cached value for ``key`` or compute it with ``loader()``.
+
+        ``loader`` may return ``None`` to signal a failed load; that result is
+        handed back to the caller but never cached.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            try:
+                entry = self._data.get(key)
+                if entry and entry[1] > time.monotonic():
+                    return entry[0]
+                value = loader()
+                if value is not None:
+                    self.set(key, value, ttl)
+                return value
+            finally:
+                # Threads already waiting hold the lock object and find the
+                # value on their re-check; the table itself only keeps keys
+                # that are being loaded right now.
+                with self._lock:
+                    if self._key_locks.get(key) is key_lock:
+                        del self._key_locks[key]
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when ``key`` is None."""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
@@ -0,0 +1,137 @@
+"""Negotiated response compression and fingerprinted, precompressed assets.
+
+``compress_response`` gzips (or, with the optional ``brotli`` package,
+brotli-compresses) buffered text responses above a size threshold; streamed
+responses and file downloads pass through untouched.
+
+``build_assets`` copies every file under ``static/css`` and ``static/js`` to
+``static/build`` with a content hash in its name, next to ``.gz`` / ``.br``
+variants compressed once at the highest level, and writes a manifest that
+maps the original name to the fingerprinted one. Because the name changes
+whenever the content does, those files can be cached for a year.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:           # optional: gzip only
+    brotli = None
+
+MIN_SIZE = 1024
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+ASSET_DIRS = ('css', 'js')
+BUILD_DIR = 'build'
+ASSET_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))    # best first
+MANIFEST = 'manifest.json'
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding, offered):
+    """The first of ``offered`` (in preference order) the client accepts, or None."""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    for encoding in offered:
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding, best=False):
+    """``best`` is for build time; per-request levels trade a little size for speed."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else 5)
+    return gzip.compress(data, compresslevel=9 if best else 6, mtime=0)
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress_response(response, accept_encoding, min_size=MIN_SIZE):
+    """Compress a buffered Flask response in place when it is worth it."""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or not is_compressible(response.mimetype)):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate(accept_encoding, available_encodings())
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    body = compress(data, encoding)
+    if len(body) >= len(data):
+        return response
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # A strong validator names exact bytes; the compressed ones differ.
+        response.set_etag(etag, weak=True)
+    return response
+
+
+# ---- static assets ----------------------------------------------------
+def fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def build_assets(static_folder, log=print):
+    """Write fingerprinted, precompressed copies of the css/js assets; returns the manifest."""
+    build_root = os.path.join(static_folder, BUILD_DIR)
+    if os.path.isdir(build_root):
+        shutil.rmtree(build_root)
+    manifest = {}
+    for directory in ASSET_DIRS:
+        source_root = os.path.join(static_folder, directory)
+        for root, _, files in os.walk(source_root):
+            for name in sorted(files):
+                source = os.path.join(root, name)
+                relative = os.path.relpath(source, static_folder).replace(os.sep, '/')
+                stem, ext = os.path.splitext(relative)
+                with open(source, 'rb') as f:
+                    data = f.read()
+                built = f"{BUILD_DIR}/{stem}.{fingerprint(data)}{ext}"
+                target = os.path.join(static_folder, *built.split('/'))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, 'wb') as f:
+                    f.write(data)
+                with open(target + '.gz', 'wb') as f:
+                    f.write(compress(data, 'gzip', best=True))
+                if brotli is not None:
+                    with open(target + '.br', 'wb') as f:
+                        f.write(compress(data, 'br', best=True))
+                manifest[relative] = built
+                log(f"   {relative} -> {built}")
+    os.makedirs(build_root, exist_ok=True)
+    with open(os.path.join(build_root, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    """Original asset name -> fingerprinted name, or {} before the first build."""
+    try:
+        with open(os.path.join(static_folder, BUILD_DIR, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
@@ -0,0 +1,72 @@
+"""Dashboard counters computed with one aggregate query per table."""
+import logging
+
+from mysql.connector import Error
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AVG_WAIT = 12
+
+# Only rows that are still active or were registered today can affect a
+# counter, so the WHERE clause keeps the aggregate off historical rows.
+PATIENT_SUMMARY_SQL = """
+    SELECT
+        SUM(registration_date >= CURDATE()) AS patients_today,
+        SUM(status IN ('Waiting', 'In Queue')) AS in_queue,
+        SUM(status = 'Waiting') AS waiting,
+        SUM(status = 'Admitted') AS admitted,
+        SUM(status = 'Consulted' AND registration_date >= CURDATE()) AS consultations_today,
+        AVG(CASE WHEN status IN ('Waiting', 'In Queue')
+                 THEN TIMESTAMPDIFF(MINUTE, registration_date, NOW()) END) AS avg_wait
+    FROM patients
+    WHERE status IN ('Waiting', 'In Queue', 'Admitted')
+       OR registration_date >= CURDATE()
+"""
+
+BED_SUMMARY_SQL = "SELECT COUNT(*) AS total_beds FROM beds"
+
+
+def empty_summary(default_wait=DEFAULT_AVG_WAIT):
+    return {
+        'patients_today': 0,
+        'in_queue': 0,
+        'waiting': 0,
+        'occupied_beds': 0,
+        'total_beds': 0,
+        'consultations_today': 0,
+        'avg_wait_time': default_wait,
+        'bed_occupancy_rate': 0
+    }
+
+
+def compute_summary(db, default_wait=DEFAULT_AVG_WAIT):
+    """Run the patient and bed aggregates on ``db`` and return the counters.
+
+    ``avg_wait_time`` is how long the patients waiting now have waited;
+    ``default_wait`` stands in when nobody is waiting.
+    """
+    summary = empty_summary(default_wait)
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(PATIENT_SUMMARY_SQL)
+        row = cursor.fetchone() or {}
+        summary['patients_today'] = int(row.get('patients_today') or 0)
+        summary['in_queue'] = int(row.get('in_queue') or 0)
+        summary['waiting'] = int(row.get('waiting') or 0)
+        summary['occupied_beds'] = int(row.get('admitted') or 0)
+        summary['consultations_today'] = int(row.get('consultations_today') or 0)
+        if row.get('avg_wait'):
+            summary['avg_wait_time'] = round(float(row['avg_wait']), 1)
+
+        try:
+            cursor.execute(BED_SUMMARY_SQL)
+            row = cursor.fetchone() or {}
+            summary['total_beds'] = int(row.get('total_beds') or 0)
+        except Error as e:
+            logger.warning("Bed summary unavailable: %s", e)
+    finally:
+        cursor.close()
+
+    if summary['total_beds'] > 0:
+        summary['bed_occupancy_rate'] = round((summary['occupied_beds'] / summary['total_beds']) * 100, 1)
+    return summary
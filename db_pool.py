@@ -0,0 +1,282 @@
+import os
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector import Error
+
+
+class PoolExhausted(Error):
+    """Raised when no connection could be checked out before the timeout."""
+
+
+class ObservedCursor:
+    """Cursor proxy that reports statements and fetched rows to the pool's observers."""
+
+    def __init__(self, raw, observers):
+        self._raw = raw
+        self._observers = observers
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        for row in self._raw:
+            self._fetched(1)
+            yield row
+
+    def _notify(self, index, *args):
+        for observer in self._observers:
+            if observer[index] is not None:
+                try:
+                    observer[index](*args)
+                except Exception:
+                    pass
+
+    def _observe(self, operation, params, started):
+        self._notify(0, operation, params, time.perf_counter() - started)
+
+    def _fetched(self, count):
+        if count:
+            self._notify(1, count)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._raw.execute(operation, params, *args, **kwargs)
+        finally:
+            self._observe(operation, params, started)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._raw.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._observe(operation, None, started)
+
+    def fetchone(self):
+        row = self._raw.fetchone()
+        self._fetched(0 if row is None else 1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._raw.fetchmany(*args, **kwargs)
+        self._fetched(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._raw.fetchall()
+        self._fetched(len(rows))
+        return rows
+
+
+class PooledConnection:
+    """Thin proxy around a MySQL connection; close() hands it back to the pool."""
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._returned = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._raw.cursor(*args, **kwargs)
+        observers = self._pool.observers
+        return ObservedCursor(cursor, observers) if observers else cursor
+
+    @property
+    def returned(self):
+        return self._returned
+
+    def close(self):
+        if self._returned:
+            return
+        self._returned = True
+        self._pool._release(self._raw, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """Bounded per-process MySQL connection pool.
+
+    Holds up to ``size`` idle connections and allows ``max_overflow`` extra
+    connections under burst load. Checkout blocks for at most ``timeout``
+    seconds, pings connections that sat idle longer than ``ping_after`` and
+    replaces connections older than ``recycle`` seconds. Returned connections
+    are rolled back so no transaction state leaks between requests.
+    """
+
+    def __init__(self, db_config, size=5, max_overflow=10, timeout=10.0,
+                 recycle=1800, ping_after=30.0, connect=None):
+        self.db_config = dict(db_config)
+        self.size = max(1, int(size))
+        self.max_overflow = max(0, int(max_overflow))
+        self.timeout = float(timeout)
+        self.recycle = float(recycle)
+        self.ping_after = float(ping_after)
+        self._connect = connect or mysql.connector.connect
+        self._idle = deque()
+        self._open = 0
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+        self.observers = ()
+        self._stats = {
+            'checkouts': 0,
+            'checkout_waits': 0,
+            'checkout_wait_seconds': 0.0,
+            'exhausted': 0,
+            'connects': 0,
+            'connect_seconds': 0.0,
+            'connect_errors': 0,
+            'recycled': 0,
+            'failed_pings': 0,
+            'discarded': 0,
+        }
+
+    # ------------------------------------------------------------------
+    def connect(self):
+        """Check out a connection, opening a new one if the pool allows."""
+        self._check_fork()
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, created_at, idle_since = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    raw = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['exhausted'] += 1
+                    raise PoolExhausted(
+                        msg=f"Connection pool exhausted ({self._open} open, timeout {self.timeout}s)"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['checkout_waits'] += 1
+                self._stats['checkout_wait_seconds'] += time.monotonic() - started
+
+        if raw is not None:
+            raw, created_at = self._validate(raw, created_at, idle_since)
+        if raw is None:
+            raw, created_at = self._open_new()
+        return PooledConnection(self, raw, created_at)
+
+    def _validate(self, raw, created_at, idle_since):
+        now = time.monotonic()
+        if now - created_at > self.recycle:
+            self._stats['recycled'] += 1
+            self._close_quietly(raw)
+            return None, None
+        if now - idle_since > self.ping_after:
+            try:
+                raw.ping(reconnect=False)
+            except Error:
+                self._stats['failed_pings'] += 1
+                self._close_quietly(raw)
+                return None, None
+        return raw, created_at
+
+    def _open_new(self):
+        started = time.monotonic()
+        try:
+            raw = self._connect(**self.db_config)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._stats['connect_errors'] += 1
+                self._cond.notify()
+            raise
+        self._stats['connects'] += 1
+        self._stats['connect_seconds'] += time.monotonic() - started
+        return raw, time.monotonic()
+
+    def _release(self, raw, created_at):
+        if os.getpid() != self._pid:
+            return
+        healthy = True
+        try:
+            if raw.unread_result:
+                raw.consume_results()
+            raw.rollback()
+        except Exception:
+            healthy = False
+
+        keep = False
+        with self._cond:
+            if healthy and len(self._idle) < self.size:
+                self._idle.append((raw, created_at, time.monotonic()))
+                keep = True
+            else:
+                self._open -= 1
+                self._stats['discarded'] += 1
+            self._cond.notify()
+        if not keep:
+            self._close_quietly(raw)
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _check_fork(self):
+        # Connections must never be shared across gunicorn workers; a forked
+        # child starts with an empty pool of its own.
+        if os.getpid() != self._pid:
+            with self._cond:
+                self._idle.clear()
+                self._open = 0
+                self._pid = os.getpid()
+
+    def add_observer(self, callback, on_rows=None):
+        """Call ``callback(statement, params, seconds)`` after every statement
+        and ``on_rows(count)`` whenever rows are fetched."""
+        with self._cond:
+            self.observers = self.observers + ((callback, on_rows),)
+
+    def remove_observer(self, callback):
+        with self._cond:
+            self.observers = tuple(o for o in self.observers if o[0] is not callback)
+
+    def dispose(self):
+        """Close every idle connection."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for raw, _, _ in idle:
+            self._close_quietly(raw)
+
+    def stats(self):
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot.update({
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                'pid': self._pid,
+            })
+        snapshot['checkout_wait_seconds'] = round(snapshot['checkout_wait_seconds'], 4)
+        snapshot['connect_seconds'] = round(snapshot['connect_seconds'], 4)
+        return snapshot
@@ -0,0 +1,120 @@
+"""Routing of read-only requests to a MySQL read replica.
+
+Views marked read-only take their connections from the replica pool while
+the replica is healthy; everything else, and every session that wrote in
+the last few seconds (read-your-writes), stays on the primary.
+
+The replica counts as healthy when
+
+* its replication delay (``SHOW REPLICA STATUS``) is at most ``max_lag``
+  seconds, and
+* it has replayed every ``live_events`` row this worker's event feed has
+  seen on the primary. Data versions, ETags and the event-invalidated
+  caches all follow that feed, so a replica that is behind it could hand
+  out an older body under a newer version.
+
+Both are read from the replica at most every ``check_seconds``; while the
+replica is behind the feed the event watermark is re-read every
+``recheck_seconds``. A failed check routes to the primary until the next
+one.
+"""
+import logging
+import threading
+import time
+
+from mysql.connector import Error
+
+logger = logging.getLogger(__name__)
+
+# MySQL < 8.0.22 only knows SHOW SLAVE STATUS; 1227: missing REPLICATION CLIENT
+SYNTAX_ERROR, ACCESS_DENIED = 1064, 1227
+
+
+class ReplicaRouter:
+    def __init__(self, pool, watermark=None, max_lag=2.0, check_seconds=5.0, recheck_seconds=0.5):
+        self.pool = pool
+        self._watermark = watermark   # () -> newest event id seen on the primary, or None
+        self.max_lag = float(max_lag)
+        self.check_seconds = float(check_seconds)
+        self.recheck_seconds = float(recheck_seconds)
+        self._check_lock = threading.Lock()
+        self._checked_at = None
+        self._lag = None
+        self._event_id = None
+        self._status_sql = "SHOW REPLICA STATUS"
+        self._status_readable = True
+        self.routed = 0
+        self.fallbacks = 0
+
+    def usable(self):
+        """True when a read-only request may use the replica right now."""
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_seconds:
+            self.check()
+        if self._lag is None or self._lag > self.max_lag or self._event_id is None:
+            return False
+        wanted = self._watermark() if self._watermark else None
+        if wanted is not None and self._event_id < wanted and now - self._checked_at >= self.recheck_seconds:
+            self.check(status=False)
+        return wanted is None or self._event_id >= wanted
+
+    def check(self, status=True):
+        """Read the replication delay and event watermark (one thread at a time)."""
+        if not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = time.monotonic()
+            try:
+                db = self.pool.connect()
+            except Error as e:
+                logger.warning("Replica unavailable: %s", e)
+                self._lag = None
+                return
+            try:
+                cursor = db.cursor(dictionary=True)
+                if status:
+                    self._lag = self._read_lag(cursor)
+                cursor.execute("SELECT MAX(id) AS id FROM live_events")
+                self._event_id = int((cursor.fetchone() or {}).get('id') or 0)
+                cursor.close()
+            except Error as e:
+                logger.warning("Replica check failed: %s", e)
+                self._lag = None
+            finally:
+                db.close()
+        finally:
+            self._check_lock.release()
+
+    def _read_lag(self, cursor):
+        while self._status_readable:
+            try:
+                cursor.execute(self._status_sql)
+                rows = cursor.fetchall()
+                break
+            except Error as e:
+                if e.errno == SYNTAX_ERROR and self._status_sql != "SHOW SLAVE STATUS":
+                    self._status_sql = "SHOW SLAVE STATUS"
+                elif e.errno == ACCESS_DENIED:
+                    logger.warning("No REPLICATION CLIENT privilege on the replica; "
+                                   "routing on the event watermark only")
+                    self._status_readable = False
+                else:
+                    raise
+        else:
+            return 0.0
+        if not rows:
+            # Not replicating from anywhere (e.g. a managed read endpoint);
+            # the event watermark still tells whether it is current.
+            return 0.0
+        lags = [row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master')) for row in rows]
+        # NULL: a channel's SQL thread is stopped, so the replica is not catching up.
+        return None if None in lags else float(max(lags))
+
+    def stats(self):
+        return {
+            'lag_seconds': self._lag,
+            'event_id': self._event_id,
+            'routed': self.routed,
+            'fallbacks': self.fallbacks,
+            'pool': self.pool.stats(),
+        }
@@ -0,0 +1,166 @@
+"""Streaming CSV / NDJSON exports for auditors.
+
+Rows are read in keyset chunks (``WHERE key > last ORDER BY key LIMIT n``)
+with a pooled connection checked out per chunk only, and rendered line by
+line into a generator. Memory stays constant whatever the row count, and a
+slow download holds neither a connection nor a server-side cursor open.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+CHUNK_SIZE = 1000
+
+
+class ExportError(ValueError):
+    pass
+
+
+class Dataset:
+    """How to read one export: FROM clause, keyset key, date and department columns."""
+
+    def __init__(self, select, source, key, date_column, department_column):
+        self.select = select
+        self.source = source
+        self.key = key
+        self.date_column = date_column
+        self.department_column = department_column
+
+
+def datasets(created_column):
+    """Exportable datasets; ``created_column`` is the patients registration time column."""
+    return {
+        'patients': Dataset(
+            'p.*', 'patients p', 'p.patient_id', f'p.{created_column}', 'p.department'
+        ),
+        'appointments': Dataset(
+            'a.*, p.name AS patient_name',
+            'patient_appointments a LEFT JOIN patients p ON p.patient_id = a.patient_id',
+            'a.id', 'a.appointment_date', 'a.department'
+        ),
+        'opd-queue': Dataset(
+            f'q.*, p.name AS patient_name, p.{created_column} AS registered_at',
+            'opd_queue q LEFT JOIN patients p ON p.patient_id = q.patient_id',
+            'q.queue_id', f'p.{created_column}', 'q.department'
+        ),
+        # Beds keep no history of their own: this is current occupancy,
+        # filtered by allocation date.
+        'beds': Dataset(
+            'b.*, p.name AS patient_name, p.department',
+            'beds b LEFT JOIN patients p ON p.patient_id = b.patient_id',
+            'b.bed_id', 'b.allocation_date', 'p.department'
+        ),
+    }
+
+
+def parse_day(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ExportError(f"{name} must be a date (YYYY-MM-DD)")
+
+
+def iter_rows(connect, dataset, date_from=None, date_to=None, department=None, chunk_size=CHUNK_SIZE):
+    """Yield dict rows of ``dataset`` in key order, one chunk per connection checkout."""
+    where, params = [], []
+    if date_from:
+        where.append(f"{dataset.date_column} >= %s")
+        params.append(date_from)
+    if date_to:
+        # Inclusive end date
+        where.append(f"{dataset.date_column} < %s")
+        params.append(date_to + timedelta(days=1))
+    if department:
+        where.append(f"{dataset.department_column} = %s")
+        params.append(department)
+    key_alias = dataset.key.split('.')[-1]
+
+    last_key = None
+    while True:
+        clauses = list(where)
+        chunk_params = list(params)
+        if last_key is not None:
+            clauses.append(f"{dataset.key} > %s")
+            chunk_params.append(last_key)
+        sql = (
+            f"SELECT {dataset.select} FROM {dataset.source}"
+            + (f" WHERE {' AND '.join(clauses)}" if clauses else "")
+            + f" ORDER BY {dataset.key} LIMIT %s"
+        )
+        db = connect()
+        if not db:
+            raise ExportError('Database connection failed')
+        try:
+            cursor = db.cursor(dictionary=True)
+            cursor.execute(sql, chunk_params + [chunk_size])
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            db.close()
+        for row in rows:
+            yield row
+        if len(rows) < chunk_size:
+            return
+        last_key = rows[-1][key_alias]
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        # TIME columns come back as timedelta
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', 'replace')
+    return value
+
+
+# A spreadsheet runs a cell that starts with one of these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    """Keep text from the public registration form from opening as a live formula."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def render(rows, fmt, flush_bytes=64 * 1024):
+    """Turn dict rows into CSV (header from the first row) or NDJSON text.
+
+    Lines are gathered into blocks of roughly ``flush_bytes`` so the server
+    writes a few large pieces rather than one per row. CSV text cells that a
+    spreadsheet would evaluate get a leading ``'``.
+    """
+    buffer = io.StringIO()
+    writer = None
+    for row in rows:
+        row = {k: _plain(v) for k, v in row.items()}
+        if fmt == 'ndjson':
+            buffer.write(json.dumps(row, default=str))
+            buffer.write('\n')
+        else:
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(row.keys()), extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow({k: _csv_cell(v) for k, v in row.items()})
+        if buffer.tell() >= flush_bytes:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def error_marker(fmt, message):
+    """Closing line of an export that failed part way, so the file itself shows it is incomplete."""
+    message = ' '.join(str(message).split())
+    if fmt == 'ndjson':
+        return json.dumps({'export_error': message, 'complete': False}) + '\n'
+    return f"# EXPORT INCOMPLETE: {message}\n"
@@ -0,0 +1,320 @@
+"""Cross-worker change feed backed by the ``live_events`` table.
+
+Write paths append rows to ``live_events`` inside their own transaction.
+Every worker runs one background thread that tails the table and fans new
+events out to in-process subscribers (SSE clients, caches, indexes), so a
+change made in one gunicorn worker reaches the others within one poll
+interval and no subscriber ever holds a database connection of its own.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from mysql.connector import Error
+
+logger = logging.getLogger(__name__)
+
+# One set-based statement per transition: the queue rows of the patient are
+# copied into the feed together with the fields the queue displays render.
+QUEUE_EVENT_SQL = """
+    INSERT INTO live_events (channel, event_type, department, patient_id, payload)
+    SELECT 'opd_queue', %s, q.department, q.patient_id,
+           JSON_OBJECT(
+               'id', p.patient_id,
+               'token_id', q.queue_id,
+               'queue_status', q.status,
+               'name', p.name,
+               'age', p.age,
+               'department', p.department,
+               'created_at', p.registration_date,
+               'assigned_doctor', p.assigned_doctor
+           )
+    FROM opd_queue q
+    JOIN patients p ON p.patient_id = q.patient_id
+    WHERE q.patient_id IN ({placeholders})
+"""
+
+
+def publish_queue_event(cursor, event_type, patient_ids):
+    """Append an ``opd_queue`` event for every queue row of ``patient_ids``.
+
+    Runs on the caller's cursor so the event commits (or rolls back)
+    atomically with the change it describes.
+    """
+    if isinstance(patient_ids, (int, str)):
+        patient_ids = [patient_ids]
+    patient_ids = list(patient_ids)
+    if not patient_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(patient_ids))
+    cursor.execute(QUEUE_EVENT_SQL.format(placeholders=placeholders), [event_type] + patient_ids)
+
+
+# Searchable fields of a patient, including every appointment token, for the
+# patient search index of each worker.
+PATIENT_EVENT_SQL = """
+    INSERT INTO live_events (channel, event_type, department, patient_id, payload)
+    SELECT 'patients', %s, p.department, p.patient_id,
+           JSON_OBJECT(
+               'name', p.name,
+               'phone', p.phone,
+               'gender', p.gender,
+               'tokens', (
+                   SELECT JSON_ARRAYAGG(pa.token_number)
+                   FROM patient_appointments pa
+                   WHERE pa.patient_id = p.patient_id
+               )
+           )
+    FROM patients p
+    WHERE p.patient_id IN ({placeholders})
+"""
+
+
+def publish_patient_event(cursor, event_type, patient_ids):
+    """Append a ``patients`` event per patient (publish 'removed' before deleting)."""
+    if isinstance(patient_ids, (int, str)):
+        patient_ids = [patient_ids]
+    patient_ids = list(patient_ids)
+    if not patient_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(patient_ids))
+    cursor.execute(PATIENT_EVENT_SQL.format(placeholders=placeholders), [event_type] + patient_ids)
+
+
+def publish_event(cursor, channel, event_type, department=None, patient_id=None, payload=None):
+    """Append a single event with an explicit payload."""
+    cursor.execute(
+        """
+        INSERT INTO live_events (channel, event_type, department, patient_id, payload)
+        VALUES (%s, %s, %s, %s, %s)
+        """,
+        (channel, event_type, department, patient_id, json.dumps(payload or {}, default=str))
+    )
+
+
+class Subscription:
+    """Bounded per-client mailbox filled by the feed thread."""
+
+    def __init__(self, feed, channels, maxlen=500):
+        self.feed = feed
+        self.channels = set(channels)
+        self._events = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self.overflowed = False
+
+    def push(self, event):
+        with self._cond:
+            if len(self._events) == self._events.maxlen:
+                self.overflowed = True
+            self._events.append(event)
+            self._cond.notify()
+
+    def wait(self, timeout):
+        """Block up to ``timeout`` seconds and return all pending events."""
+        with self._cond:
+            if not self._events:
+                self._cond.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    def close(self):
+        self.feed.unsubscribe(self)
+
+
+class EventFeed:
+    """Tails ``live_events`` in a single daemon thread per worker process."""
+
+    def __init__(self, connect, poll_interval=1.0, backlog=1000, retention_hours=24):
+        self._connect = connect
+        self.poll_interval = float(poll_interval)
+        self.retention_hours = int(retention_hours)
+        self._recent = deque(maxlen=backlog)
+        self._subscriptions = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_id = None
+        self._last_prune = 0.0
+        # Auto-increment ids can commit out of order. Skipped ids are kept as
+        # gaps and re-read for a few seconds before they are given up on.
+        self._gaps = {}
+        self._seen = set()
+        self.gap_timeout = 10.0
+        # Per-channel data versions for conditional GETs. The committed part
+        # is the newest event id of the channel, which is the same in every
+        # worker; ``_pending`` counts local writes the feed hasn't read back yet.
+        # Pending versions carry the worker's pid and a boot nonce, as another
+        # worker's count of its own writes can reach the same number.
+        self._channel_ids = {}
+        self._pending = {}
+        self._worker = (None, None)
+        self._changed_at = {}
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def mark_changed(self, channel):
+        """Note a local write on ``channel`` so its version moves immediately."""
+        with self._lock:
+            self._pending[channel] = self._pending.get(channel, 0) + 1
+            self._changed_at[channel] = time.time()
+
+    def version(self, channel):
+        """Return ``(version, changed_at)`` for ``channel`` or None before the first poll."""
+        with self._lock:
+            if self._last_id is None:
+                return None
+            version = str(self._channel_ids.get(channel, 0))
+            if self._pending.get(channel):
+                version += f".{self._worker_tag()}.{self._pending[channel]}"
+            return version, self._changed_at.get(channel)
+
+    def _worker_tag(self):
+        pid = os.getpid()
+        if self._worker[0] != pid:
+            self._worker = (pid, f"{pid}-{os.urandom(4).hex()}")
+        return self._worker[1]
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='live-events-feed', daemon=True)
+            self._thread.start()
+
+    def add_listener(self, callback, channels):
+        """Register ``callback(event)`` for in-process consumers such as caches."""
+        with self._lock:
+            self._listeners.append((callback, set(channels)))
+
+    def subscribe(self, channels):
+        sub = Subscription(self, channels)
+        with self._lock:
+            self._subscriptions.add(sub)
+        self.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscriptions.discard(sub)
+
+    def replay_since(self, event_id, channels):
+        """Return buffered events after ``event_id`` or None if they fell out of the buffer."""
+        with self._lock:
+            recent = list(self._recent)
+        if recent and recent[0]['id'] > event_id + 1:
+            return None
+        return [e for e in recent if e['id'] > event_id and e['channel'] in channels]
+
+    # ------------------------------------------------------------------
+    def _run(self):
+        while True:
+            try:
+                self._poll()
+            except Error as e:
+                logger.warning("Live event feed poll failed: %s", e)
+            except Exception as e:
+                logger.warning("Live event feed error: %s", e, exc_info=True)
+            time.sleep(self.poll_interval)
+
+    def _poll(self):
+        db = self._connect()
+        if not db:
+            return
+        try:
+            cursor = db.cursor(dictionary=True)
+            if self._last_id is None:
+                cursor.execute("SELECT channel, MAX(id) AS last_id FROM live_events GROUP BY channel")
+                rows = cursor.fetchall()
+                started = time.time()
+                with self._lock:
+                    for row in rows:
+                        self._channel_ids[row['channel']] = int(row['last_id'])
+                        self._changed_at.setdefault(row['channel'], started)
+                    self._last_id = max(self._channel_ids.values(), default=0)
+
+            now = time.monotonic()
+            self._gaps = {gid: seen for gid, seen in self._gaps.items() if now - seen < self.gap_timeout}
+            low = min(self._gaps) - 1 if self._gaps else self._last_id
+            while True:
+                cursor.execute(
+                    """
+                    SELECT id, channel, event_type, department, patient_id, payload, created_at
+                    FROM live_events
+                    WHERE id > %s
+                    ORDER BY id
+                    LIMIT 500
+                    """,
+                    (low,)
+                )
+                rows = cursor.fetchall()
+                for row in rows:
+                    event_id = int(row['id'])
+                    if event_id in self._seen:
+                        continue
+                    if event_id - self._last_id <= 1000:
+                        for missing in range(self._last_id + 1, event_id):
+                            self._gaps.setdefault(missing, now)
+                    self._gaps.pop(event_id, None)
+                    self._dispatch(self._decode(row))
+                if len(rows) < 500:
+                    break
+                low = int(rows[-1]['id'])
+
+            if time.monotonic() - self._last_prune > 3600:
+                self._last_prune = time.monotonic()
+                cursor.execute(
+                    "DELETE FROM live_events WHERE created_at < NOW() - INTERVAL %s HOUR LIMIT 10000",
+                    (self.retention_hours,)
+                )
+                db.commit()
+            cursor.close()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _decode(row):
+        try:
+            payload = json.loads(row.get('payload') or '{}')
+        except ValueError:
+            payload = {}
+        created = row.get('created_at')
+        return {
+            'id': int(row['id']),
+            'channel': row['channel'],
+            'type': row['event_type'],
+            'department': row.get('department'),
+            'patient_id': row.get('patient_id'),
+            'payload': payload,
+            'created_at': created.isoformat() if hasattr(created, 'isoformat') else created,
+        }
+
+    def _dispatch(self, event):
+        self._last_id = max(self._last_id, event['id'])
+        with self._lock:
+            channel = event['channel']
+            if event['id'] > self._channel_ids.get(channel, 0):
+                self._channel_ids[channel] = event['id']
+                self._pending.pop(channel, None)
+            else:
+                # A late-committing event still changed the data.
+                self._pending[channel] = self._pending.get(channel, 0) + 1
+            self._changed_at[channel] = time.time()
+            if len(self._recent) == self._recent.maxlen:
+                self._seen.discard(self._recent[0]['id'])
+            self._recent.append(event)
+            self._seen.add(event['id'])
+            subscriptions = [s for s in self._subscriptions if event['channel'] in s.channels]
+            listeners = [cb for cb, channels in self._listeners if event['channel'] in channels]
+        for sub in subscriptions:
+            sub.push(event)
+        for callback in listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.warning("Live event listener failed: %s", e, exc_info=True)
@@ -0,0 +1,303 @@
+"""Per-endpoint request metrics in Prometheus text format.
+
+Each worker process counts requests, latency, SQL statements, SQL time,
+fetched rows, response bytes and connection checkout time per Flask
+endpoint. gunicorn workers don't share memory, so every worker writes a
+snapshot of its counters to ``<directory>/<pid>-<nonce>.json`` every few
+seconds and ``/metrics`` sums the snapshots of all workers. The nonce is
+drawn when the process starts, so a worker that reuses an old pid writes a
+file of its own. Counters of exited workers stay in their files so totals
+never go backwards until the next deploy: ``flask --app app metrics-reset``
+clears the directory before gunicorn starts (see the Procfile).
+
+Recording a request costs a lock acquisition and a handful of additions,
+which is cheap enough to leave on.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+POOL_COUNTERS = ('checkouts', 'checkout_waits', 'checkout_wait_seconds', 'connects',
+                 'connect_seconds', 'connect_errors', 'exhausted', 'recycled', 'failed_pings', 'discarded')
+POOL_GAUGES = ('open', 'idle', 'in_use')
+
+
+class RequestStats:
+    """SQL work done while serving one request."""
+
+    __slots__ = ('queries', 'sql_seconds', 'rows', 'connect_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.connect_seconds = 0.0
+
+
+def _histogram(buckets):
+    # one count per bucket, +Inf, then the sum
+    return [0] * (len(buckets) + 1) + [0.0]
+
+
+def _observe(histogram, buckets, value):
+    histogram[bisect_left(buckets, value)] += 1
+    histogram[-1] += value
+
+
+def _empty_endpoint():
+    return {
+        'latency': _histogram(LATENCY_BUCKETS),
+        'queries': _histogram(QUERY_COUNT_BUCKETS),
+        'sql_seconds': 0.0,
+        'rows': 0,
+        'response_bytes': 0,
+        'connect_seconds': 0.0,
+    }
+
+
+def _merge(into, other):
+    for key, value in other.items():
+        if isinstance(value, dict):
+            _merge(into.setdefault(key, {}), value)
+        elif isinstance(value, list):
+            current = into.setdefault(key, [0] * len(value))
+            for i, item in enumerate(value):
+                current[i] += item
+        else:
+            into[key] = into.get(key, 0) + value
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _snapshot_name(data):
+    return f"{data['pid']}-{data['nonce']}.json"
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    def __init__(self, directory=None, flush_seconds=5.0, pool_stats=None, prefix='mediflow'):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), 'mediflow-metrics')
+        self.flush_seconds = float(flush_seconds)
+        self.pool_stats = pool_stats
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._requests = {}       # "endpoint|method|status" -> count
+        self._endpoints = {}      # endpoint -> _empty_endpoint()
+        self._pid = os.getpid()
+        self._nonce = os.urandom(4).hex()
+        self._flushed_at = 0.0
+
+    # ---- per-request accounting -------------------------------------
+    def begin(self):
+        self._local.stats = RequestStats()
+
+    def current(self):
+        return getattr(self._local, 'stats', None)
+
+    def on_statement(self, statement, params, seconds):
+        """Pool observer: attribute a statement to the request on this thread."""
+        stats = self.current()
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_seconds += seconds
+
+    def on_rows(self, count):
+        stats = self.current()
+        if stats is not None:
+            stats.rows += count
+
+    def on_connect(self, seconds):
+        stats = self.current()
+        if stats is not None:
+            stats.connect_seconds += seconds
+
+    def finish(self, endpoint, method, status, seconds, response_bytes=0):
+        """Record a finished request; returns the stats it collected."""
+        stats = self.current() or RequestStats()
+        self._local.stats = None
+        key = f"{endpoint}|{method}|{status}"
+        with self._lock:
+            self._check_fork()
+            self._requests[key] = self._requests.get(key, 0) + 1
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = self._endpoints[endpoint] = _empty_endpoint()
+            _observe(entry['latency'], LATENCY_BUCKETS, seconds)
+            _observe(entry['queries'], QUERY_COUNT_BUCKETS, stats.queries)
+            entry['sql_seconds'] += stats.sql_seconds
+            entry['rows'] += stats.rows
+            entry['response_bytes'] += response_bytes
+            entry['connect_seconds'] += stats.connect_seconds
+        return stats
+
+    def add_response_bytes(self, endpoint, count):
+        """Bytes of a streamed response, counted once the stream ends."""
+        with self._lock:
+            entry = self._endpoints.setdefault(endpoint, _empty_endpoint())
+            entry['response_bytes'] += count
+
+    def count_stream(self, endpoint, chunks):
+        total = 0
+        try:
+            for chunk in chunks:
+                total += len(chunk)
+                yield chunk
+        finally:
+            self.add_response_bytes(endpoint, total)
+
+    def _check_fork(self):
+        if os.getpid() != self._pid:
+            # Counters inherited from the gunicorn master belong to its file.
+            self._pid = os.getpid()
+            self._nonce = os.urandom(4).hex()
+            self._requests, self._endpoints = {}, {}
+
+    # ---- cross-worker snapshots -------------------------------------
+    def snapshot(self):
+        with self._lock:
+            self._check_fork()
+            data = {
+                'pid': self._pid,
+                'nonce': self._nonce,
+                'requests': dict(self._requests),
+                'endpoints': json.loads(json.dumps(self._endpoints)),
+            }
+        pool_stats = self.pool_stats() if self.pool_stats else None
+        if pool_stats:
+            data['pool'] = {k: pool_stats.get(k, 0) for k in POOL_COUNTERS}
+            data['pool_gauges'] = {k: pool_stats.get(k, 0) for k in POOL_GAUGES}
+        return data
+
+    def maybe_flush(self):
+        """Write this worker's snapshot if the last one is older than flush_seconds."""
+        now = time.monotonic()
+        if now - self._flushed_at < self.flush_seconds:
+            return
+        self._flushed_at = now
+        self.flush()
+
+    def flush(self):
+        data = self.snapshot()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, _snapshot_name(data))
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("Could not write metrics snapshot: %s", e)
+
+    def collect(self):
+        """Sum the snapshots of every worker (this one read fresh)."""
+        own = self.snapshot()
+        total = {'requests': {}, 'endpoints': {}, 'pool': {}, 'pool_gauges': {}}
+        _merge(total, {k: v for k, v in own.items() if k not in ('pid', 'nonce')})
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            names = []
+        for name in names:
+            if not name.endswith('.json') or name == _snapshot_name(own):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not _pid_alive(int(data.get('pid') or 0)):
+                # Gauges of exited workers are meaningless; their counters still count.
+                data.pop('pool_gauges', None)
+            data.pop('pid', None)
+            data.pop('nonce', None)
+            _merge(total, data)
+        return total
+
+    def reset(self):
+        """Delete every worker's snapshot; run before the workers start. Returns the count."""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return 0
+        removed = 0
+        for name in names:
+            if name.endswith(('.json', '.tmp')):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    removed += 1
+                except OSError as e:
+                    logger.warning("Could not remove metrics snapshot %s: %s", name, e)
+        return removed
+
+    # ---- Prometheus text format -------------------------------------
+    def render(self):
+        total = self.collect()
+        p = self.prefix
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+
+        def histogram(name, buckets, attr):
+            for endpoint, entry in sorted(total['endpoints'].items()):
+                values = entry[attr]
+                cumulative = 0
+                for bound, count in zip(list(buckets) + ['+Inf'], values[:-1]):
+                    cumulative += count
+                    lines.append(f'{p}_{name}_bucket{{endpoint="{_label(endpoint)}",le="{bound}"}} {cumulative}')
+                lines.append(f'{p}_{name}_sum{{endpoint="{_label(endpoint)}"}} {values[-1]}')
+                lines.append(f'{p}_{name}_count{{endpoint="{_label(endpoint)}"}} {cumulative}')
+
+        def per_endpoint(name, attr):
+            for endpoint, entry in sorted(total['endpoints'].items()):
+                lines.append(f'{p}_{name}{{endpoint="{_label(endpoint)}"}} {entry[attr]}')
+
+        family('http_requests_total', 'counter', 'Requests served, by endpoint, method and status.')
+        for key, count in sorted(total['requests'].items()):
+            endpoint, method, status = key.rsplit('|', 2)
+            lines.append(
+                f'{p}_http_requests_total{{endpoint="{_label(endpoint)}",method="{method}",status="{status}"}} {count}'
+            )
+        family('http_request_duration_seconds', 'histogram', 'Time to produce the response.')
+        histogram('http_request_duration_seconds', LATENCY_BUCKETS, 'latency')
+        family('sql_queries_per_request', 'histogram', 'SQL statements executed per request.')
+        histogram('sql_queries_per_request', QUERY_COUNT_BUCKETS, 'queries')
+        family('sql_seconds_total', 'counter', 'Time spent executing SQL statements.')
+        per_endpoint('sql_seconds_total', 'sql_seconds')
+        family('sql_rows_fetched_total', 'counter', 'Rows fetched from MySQL.')
+        per_endpoint('sql_rows_fetched_total', 'rows')
+        family('db_connect_seconds_total', 'counter', 'Time spent checking out (and opening) pooled connections.')
+        per_endpoint('db_connect_seconds_total', 'connect_seconds')
+        family('http_response_bytes_total', 'counter', 'Response body bytes sent.')
+        per_endpoint('http_response_bytes_total', 'response_bytes')
+
+        for key in POOL_COUNTERS:
+            if key in total['pool']:
+                family(f'db_pool_{key}_total', 'counter', f'Connection pool {key.replace("_", " ")}, all workers.')
+                lines.append(f'{p}_db_pool_{key}_total {total["pool"][key]}')
+        for key in POOL_GAUGES:
+            if key in total['pool_gauges']:
+                family(f'db_pool_{key}_connections', 'gauge', f'Pooled connections {key.replace("_", " ")}, live workers.')
+                lines.append(f'{p}_db_pool_{key}_connections {total["pool_gauges"][key]}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,284 @@
+"""Versioned schema migrations.
+
+``schema.sql`` creates the base tables (patients, opd_queue, beds,
+admin_users). Everything the app added on top of them lives here as an
+ordered list of migrations. ``flask --app app db-upgrade`` applies them
+before the workers start (the Procfile runs it first; ``AUTO_MIGRATE=1``
+instead applies them when the app is imported). Request handlers never run
+DDL: they only compare the recorded version with ``SCHEMA_VERSION`` and
+answer 503 while the database is behind.
+
+A migration step is either an SQL string or a callable ``step(cursor, log)``
+for changes that depend on what the live schema looks like.
+"""
+from mysql.connector import Error
+
+MIGRATION_LOCK = 'mediflow_schema_migrations'
+
+
+def add_index(table, name, columns):
+    """Step that adds index ``name`` unless it exists or a column is missing.
+
+    Deployed databases don't all have the same patients/opd_queue columns
+    (``created_at`` vs ``registration_date``, ``token``), so indexes on
+    optional columns are skipped where the column isn't there.
+    """
+    def step(cursor, log):
+        cursor.execute(
+            """
+            SELECT COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            """,
+            (table,)
+        )
+        existing = {row[0].lower() for row in cursor.fetchall()}
+        missing = [c for c in columns if c.lower() not in existing]
+        if missing:
+            log(f"   skipping {name}: {table} has no {', '.join(missing)}")
+            return
+        cursor.execute(
+            """
+            SELECT 1 FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+            LIMIT 1
+            """,
+            (table, name)
+        )
+        if cursor.fetchone():
+            return
+        log(f"   adding {name} on {table} ({', '.join(columns)})")
+        # Online DDL: the table stays readable and writable while it builds.
+        cursor.execute(
+            f"ALTER TABLE {table} ADD INDEX {name} ({', '.join(columns)}), ALGORITHM=INPLACE, LOCK=NONE"
+        )
+    return step
+
+
+def unique_appointment_tokens(cursor, log):
+    """Make (token_number, appointment_date) unique.
+
+    Random tokens issued before the sequential allocator could collide on
+    the same day; all but the first appointment of each collision get their
+    id appended so the unique index can be built.
+    """
+    cursor.execute(
+        """
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'patient_appointments'
+          AND INDEX_NAME = 'uq_appointments_token_day'
+        LIMIT 1
+        """
+    )
+    if cursor.fetchone():
+        return
+    cursor.execute(
+        """
+        UPDATE patient_appointments a
+        JOIN (
+            SELECT token_number, appointment_date, MIN(id) AS keep_id
+            FROM patient_appointments
+            WHERE token_number IS NOT NULL
+            GROUP BY token_number, appointment_date
+            HAVING COUNT(*) > 1
+        ) d ON d.token_number = a.token_number AND d.appointment_date <=> a.appointment_date
+        SET a.token_number = CONCAT(a.token_number, '-', a.id)
+        WHERE a.id <> d.keep_id
+        """
+    )
+    if cursor.rowcount:
+        log(f"   renamed {cursor.rowcount} duplicate appointment tokens")
+    cursor.execute(
+        "ALTER TABLE patient_appointments ADD UNIQUE INDEX uq_appointments_token_day (token_number, appointment_date)"
+    )
+
+
+def drop_index(table, name):
+    """Step that drops index ``name`` if it exists."""
+    def step(cursor, log):
+        cursor.execute(
+            """
+            SELECT 1 FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+            LIMIT 1
+            """,
+            (table, name)
+        )
+        if cursor.fetchone():
+            cursor.execute(f"ALTER TABLE {table} DROP INDEX {name}")
+    return step
+
+
+MIGRATIONS = [
+    (1, 'create patient_appointments', [
+        """
+        CREATE TABLE IF NOT EXISTS patient_appointments (
+            id INT PRIMARY KEY AUTO_INCREMENT,
+            patient_id INT NOT NULL,
+            token_number VARCHAR(50),
+            department VARCHAR(100),
+            appointment_date DATE,
+            appointment_time TIME,
+            status VARCHAR(50) DEFAULT 'Waiting',
+            queue_position INT DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_patient (patient_id)
+        )
+        """,
+    ]),
+    (2, 'create live_events', [
+        """
+        CREATE TABLE IF NOT EXISTS live_events (
+            id BIGINT PRIMARY KEY AUTO_INCREMENT,
+            channel VARCHAR(32) NOT NULL,
+            event_type VARCHAR(32) NOT NULL,
+            department VARCHAR(100),
+            patient_id INT,
+            payload TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_live_events_created (created_at)
+        )
+        """,
+    ]),
+    (3, 'create daily_rollups', [
+        """
+        CREATE TABLE IF NOT EXISTS daily_rollups (
+            day DATE NOT NULL,
+            department VARCHAR(100) NOT NULL DEFAULT '',
+            registrations INT NOT NULL DEFAULT 0,
+            consultations INT NOT NULL DEFAULT 0,
+            admissions INT NOT NULL DEFAULT 0,
+            discharges INT NOT NULL DEFAULT 0,
+            wait_minutes BIGINT NOT NULL DEFAULT 0,
+            waits INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, department)
+        )
+        """,
+    ]),
+    # Indexes for the predicates the route handlers actually use; checked
+    # with `flask --app app query-plan-check`.
+    (4, 'add query indexes', [
+        # Status tabs and counters, department filters, date ranges
+        add_index('patients', 'idx_patients_status', ['status']),
+        add_index('patients', 'idx_patients_department', ['department']),
+        add_index('patients', 'idx_patients_registration_date', ['registration_date']),
+        add_index('patients', 'idx_patients_created_at', ['created_at']),
+        add_index('patients', 'idx_patients_bed', ['bed_id']),
+        add_index('patients', 'idx_patients_token', ['token']),
+        # Queue: per-patient lookups, the department board (ordered by
+        # queue_id) and the status counts
+        add_index('opd_queue', 'idx_opd_queue_patient', ['patient_id']),
+        add_index('opd_queue', 'idx_opd_queue_department', ['department', 'status', 'queue_id']),
+        add_index('opd_queue', 'idx_opd_queue_status', ['status', 'department']),
+        # Token lookups and export date ranges
+        add_index('patient_appointments', 'idx_appointments_token', ['token_number']),
+        add_index('patient_appointments', 'idx_appointments_date', ['appointment_date']),
+        # Bed board and per-patient bed lookups
+        add_index('beds', 'idx_beds_status_ward', ['status', 'ward']),
+        add_index('beds', 'idx_beds_ward', ['ward']),
+        add_index('beds', 'idx_beds_patient', ['patient_id']),
+        # Feed start-up reads MAX(id) per channel
+        add_index('live_events', 'idx_live_events_channel', ['channel', 'id']),
+    ]),
+    (5, 'sequential appointment tokens', [
+        """
+        CREATE TABLE IF NOT EXISTS token_counters (
+            department VARCHAR(100) NOT NULL,
+            day DATE NOT NULL,
+            prefix VARCHAR(8) NOT NULL,
+            last_value INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (department, day)
+        )
+        """,
+        unique_appointment_tokens,
+        # The unique index starts with token_number and replaces it
+        drop_index('patient_appointments', 'idx_appointments_token'),
+    ]),
+    (6, 'create service_time_stats', [
+        """
+        CREATE TABLE IF NOT EXISTS service_time_stats (
+            scope VARCHAR(16) NOT NULL,
+            scope_key VARCHAR(150) NOT NULL,
+            ewma_minutes DOUBLE,
+            samples INT NOT NULL DEFAULT 0,
+            recent TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (scope, scope_key)
+        )
+        """,
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+class SchemaOutOfDate(Exception):
+    """The database schema is older than this build of the app expects."""
+
+    def __init__(self, current, expected):
+        self.current = current
+        self.expected = expected
+        super().__init__(
+            f"Database schema is at version {current}, this app needs version {expected}. "
+            f"Run `flask --app app db-upgrade`."
+        )
+
+
+def current_version(db):
+    """Return the highest applied migration version (0 for a fresh database)."""
+    cursor = db.cursor()
+    try:
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+        row = cursor.fetchone()
+        return int(row[0]) if row else 0
+    except Error as e:
+        # 1146: table doesn't exist -> nothing applied yet
+        if getattr(e, 'errno', None) == 1146:
+            return 0
+        raise
+    finally:
+        cursor.close()
+
+
+def run_migrations(db, log=print):
+    """Apply every pending migration in order and return the resulting version.
+
+    A named MySQL lock keeps concurrently starting workers from racing.
+    """
+    cursor = db.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, 60)", (MIGRATION_LOCK,))
+    got_lock = (cursor.fetchone() or [0])[0] == 1
+    if not got_lock:
+        cursor.close()
+        raise Error(msg='Timed out waiting for the schema migration lock')
+    try:
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                name VARCHAR(200) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        version = current_version(db)
+        for number, name, statements in MIGRATIONS:
+            if number <= version:
+                continue
+            log(f"🛠️  Applying migration {number}: {name}")
+            for statement in statements:
+                if callable(statement):
+                    statement(cursor, log)
+                else:
+                    cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (number, name)
+            )
+            db.commit()
+            version = number
+        return version
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+        cursor.fetchone()
+        cursor.close()
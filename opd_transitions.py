@@ -0,0 +1,75 @@
+"""Validation for batched OPD queue transitions.
+
+``POST /api/opd-queue/transitions`` applies many start / complete / cancel
+moves in one transaction. This module checks the request and decides,
+from each patient's current queue status, which moves are allowed; the
+route then runs one UPDATE per action for all the accepted patients.
+"""
+MAX_BATCH = 500
+
+# action -> (patients.status, opd_queue.status, queue statuses it may leave)
+TRANSITIONS = {
+    'start': ('In Consultation', 'in_consultation', ('waiting',)),
+    'complete': ('Completed', 'completed', ('waiting', 'in_consultation')),
+    'cancel': ('Cancelled', 'cancelled', ('waiting', 'in_consultation')),
+}
+
+
+class TransitionError(ValueError):
+    pass
+
+
+def normalize_status(status):
+    return (status or '').strip().lower().replace(' ', '_')
+
+
+def parse_batch(payload):
+    """``[(patient_id, action), ...]`` from ``{"transitions": [{"patient_id", "action"}]}``."""
+    items = (payload or {}).get('transitions') if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        raise TransitionError('transitions must be a non-empty list')
+    if len(items) > MAX_BATCH:
+        raise TransitionError(f'At most {MAX_BATCH} transitions per request')
+    batch = []
+    for item in items:
+        item = item if isinstance(item, dict) else {}
+        try:
+            patient_id = int(item.get('patient_id'))
+        except (TypeError, ValueError):
+            patient_id = None
+        batch.append((patient_id, str(item.get('action') or '').strip().lower()))
+    return batch
+
+
+def plan(batch, current):
+    """Split ``batch`` into accepted patient ids per action and per-item results.
+
+    ``current`` maps patient_id -> status of the patient's latest queue row.
+    Results are in request order; rejected items carry a message.
+    """
+    accepted = {action: [] for action in TRANSITIONS}
+    results = []
+    seen = set()
+    for patient_id, action in batch:
+        result = {'patient_id': patient_id, 'action': action, 'success': False}
+        results.append(result)
+        if patient_id is None:
+            result['message'] = 'patient_id must be an integer'
+        elif action not in TRANSITIONS:
+            result['message'] = f"Unknown action; use one of {', '.join(sorted(TRANSITIONS))}"
+        elif patient_id in seen:
+            result['message'] = 'Duplicate patient in this batch'
+        elif patient_id not in current:
+            result['message'] = 'Patient is not in the OPD queue'
+        else:
+            status = normalize_status(current[patient_id])
+            result['from'] = status
+            if status not in TRANSITIONS[action][2]:
+                result['message'] = f"Cannot {action} a consultation that is {status.replace('_', ' ')}"
+            else:
+                result['success'] = True
+                result['to'] = TRANSITIONS[action][1]
+                accepted[action].append(patient_id)
+        if patient_id is not None:
+            seen.add(patient_id)
+    return accepted, results
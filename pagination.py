@@ -0,0 +1,55 @@
+"""Keyset (cursor) pagination helpers for the list APIs.
+
+Pages are ordered by a unique key (the patient id, newest first) and the
+next page continues strictly after the last key returned, so the database
+seeks straight to the page instead of counting past an OFFSET and rows
+registered meanwhile never shift or repeat entries between pages. The
+cursor handed to clients is opaque; only this module knows what is in it.
+"""
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(key):
+    raw = json.dumps({'k': key}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return the key stored in ``token`` (None for an empty token)."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        key = json.loads(raw)['k']
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(key, int):
+        raise InvalidCursor('Invalid cursor')
+    return key
+
+
+def page_size(raw, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        size = int(raw) if raw not in (None, '') else default
+    except ValueError:
+        size = default
+    return min(max(size, 1), maximum)
+
+
+def split_page(rows, limit, key):
+    """Trim the look-ahead row fetched with ``LIMIT limit + 1``.
+
+    Returns ``(rows, next_cursor)``; next_cursor is None on the last page.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1][key])
@@ -0,0 +1,214 @@
+"""Bulk patient import from CSV or NDJSON.
+
+Rows are read one at a time from the upload, validated with the same rules
+as the registration form and written in chunks: one multi-row INSERT each
+for ``patients``, ``opd_queue`` and ``patient_appointments`` and one commit
+per chunk. Memory stays flat no matter how large the file is; a failed
+chunk is rolled back and reported without affecting the chunks before it.
+"""
+import codecs
+import csv
+import json
+
+from mysql.connector import Error
+
+from registration import OPTIONAL_FIELDS, RegistrationError, validate_registration
+
+FORMATS = ('csv', 'ndjson')
+MAX_REPORTED_ERRORS = 1000
+
+
+def detect_format(filename=None, content_type=None, default='csv'):
+    name = (filename or '').lower()
+    kind = (content_type or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')) or 'ndjson' in kind or 'jsonlines' in kind:
+        return 'ndjson'
+    if name.endswith('.csv') or 'csv' in kind:
+        return 'csv'
+    return default
+
+
+def iter_rows(stream, fmt):
+    """Yield ``(line, row, problem)`` for each record of a binary stream.
+
+    ``row`` is a dict of raw field values; ``problem`` is a message when the
+    line itself could not be parsed (``row`` is then None).
+    """
+    reader = codecs.getreader('utf-8-sig')(stream, errors='replace')
+    if fmt == 'csv':
+        rows = csv.DictReader(reader)
+        for row in rows:
+            yield rows.line_num, row, None
+        return
+    for line_no, line in enumerate(reader, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, 'Each line must be a JSON object'
+            continue
+        yield line_no, row, None
+
+
+def _insert_rows(cursor, table, columns, rows, increment):
+    """One multi-row INSERT; returns the generated ids in row order.
+
+    InnoDB hands a single multi-row "simple insert" consecutive
+    auto-increment values (stepping by auto_increment_increment), so the
+    ids are derived from LAST_INSERT_ID() instead of being read back.
+    """
+    row_sql = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ', '.join([row_sql] * len(rows))
+    cursor.execute(sql, [value for row in rows for value in row])
+    first_id = cursor.lastrowid
+    return [first_id + i * increment for i in range(len(rows))]
+
+
+class PatientImport:
+    """One import run. Call ``run(rows)`` with the output of ``iter_rows``.
+
+    ``allocate_tokens(department, count, day)`` returns ``count`` appointment
+    tokens for a department and appointment day. ``publish(cursor, patient_ids)`` records the
+    change events of a chunk inside its transaction and ``on_queued`` gets
+    the ``(queue_id, department)`` pairs once the chunk is committed.
+    With ``enqueue=False`` patients are stored as 'Registered' and not
+    added to the OPD queue, which is what migrating old records wants.
+    """
+
+    def __init__(self, db, allocate_tokens, patient_columns=(), publish=None,
+                 on_queued=None, chunk_size=1000, enqueue=True, log=print):
+        self.db = db
+        self.allocate_tokens = allocate_tokens
+        self.optional_columns = [c for c in OPTIONAL_FIELDS if c in set(patient_columns or ())]
+        self.publish = publish
+        self.on_queued = on_queued
+        self.chunk_size = max(1, int(chunk_size))
+        self.enqueue = enqueue
+        self.log = log
+        self.processed = 0
+        self.imported = 0
+        self.failed = 0
+        self.chunks = 0
+        self.errors = []
+        self._increment = None
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'message': message})
+
+    def run(self, rows):
+        chunk = []
+        for line, row, problem in rows:
+            self.processed += 1
+            if problem:
+                self.error(line, problem)
+                continue
+            try:
+                chunk.append((line, validate_registration(row)))
+            except RegistrationError as e:
+                self.error(line, str(e))
+                continue
+            if len(chunk) >= self.chunk_size:
+                self._flush(chunk)
+                chunk = []
+        if chunk:
+            self._flush(chunk)
+        return self.report()
+
+    def report(self):
+        return {
+            'processed': self.processed,
+            'imported': self.imported,
+            'failed': self.failed,
+            'chunks': self.chunks,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+    def _flush(self, chunk):
+        cursor = self.db.cursor()
+        try:
+            queued = self._write_chunk(cursor, [record for _, record in chunk])
+            self.db.commit()
+        except Error as e:
+            self.db.rollback()
+            self.log(f"❌ Import chunk starting at line {chunk[0][0]} failed: {e}")
+            for line, _ in chunk:
+                self.error(line, f'Database error: {e}')
+            return
+        finally:
+            cursor.close()
+        self.chunks += 1
+        self.imported += len(chunk)
+        if queued and self.on_queued:
+            self.on_queued(queued)
+        self.log(f"📥 Imported {self.imported} patients ({self.failed} rejected)")
+
+    def _write_chunk(self, cursor, records):
+        if self._increment is None:
+            cursor.execute("SELECT @@auto_increment_increment")
+            self._increment = int(cursor.fetchone()[0] or 1)
+
+        status = 'Waiting' if self.enqueue else 'Registered'
+        columns = ['name', 'age', 'phone', 'department', 'status'] + self.optional_columns
+        patient_ids = _insert_rows(cursor, 'patients', columns, [
+            [r['name'], r['age'], r['phone'], r['department'], status]
+            + [r[c] or None for c in self.optional_columns]
+            for r in records
+        ], self._increment)
+
+        positions = [None] * len(records)
+        queued = []
+        if self.enqueue:
+            # Positions continue from the department's current queue length.
+            departments = sorted({r['department'] for r in records})
+            placeholders = ', '.join(['%s'] * len(departments))
+            cursor.execute(
+                f"""
+                SELECT department, COUNT(*)
+                FROM opd_queue
+                WHERE status IN ('waiting', 'in_consultation') AND department IN ({placeholders})
+                GROUP BY department
+                """,
+                departments
+            )
+            lengths = {department: int(count) for department, count in cursor.fetchall()}
+            for i, r in enumerate(records):
+                lengths[r['department']] = lengths.get(r['department'], 0) + 1
+                positions[i] = lengths[r['department']]
+
+            queue_ids = _insert_rows(cursor, 'opd_queue', ['patient_id', 'department', 'status', 'token'], [
+                [patient_id, r['department'], 'waiting', patient_id]
+                for patient_id, r in zip(patient_ids, records)
+            ], self._increment)
+            queued = [(queue_id, r['department']) for queue_id, r in zip(queue_ids, records)]
+
+        by_day = {}
+        for i, r in enumerate(records):
+            by_day.setdefault((r['department'], r['appointment_date']), []).append(i)
+        tokens = [None] * len(records)
+        for (department, day), indexes in by_day.items():
+            for i, token in zip(indexes, self.allocate_tokens(department, len(indexes), day)):
+                tokens[i] = token
+
+        _insert_rows(cursor, 'patient_appointments', [
+            'patient_id', 'token_number', 'department', 'appointment_date',
+            'appointment_time', 'status', 'queue_position'
+        ], [
+            [
+                patient_id, str(token), r['department'], r['appointment_date'].isoformat(),
+                r['appointment_time'].strftime('%H:%M:%S') if r['appointment_time'] else None,
+                'Waiting', position
+            ]
+            for patient_id, token, position, r in zip(patient_ids, tokens, positions, records)
+        ], self._increment)
+
+        if self.publish:
+            self.publish(cursor, patient_ids)
+        return queued
@@ -0,0 +1,116 @@
+"""EXPLAIN-based query plan checks.
+
+``flask --app app query-plan-check`` drives the route handlers through the
+test client against a seeded database, records every statement they issue
+through the pool's observer hook and EXPLAINs each distinct statement with
+the parameters it ran with. A plan that reads a large table in full (access
+type ``ALL``) is a finding and the command exits non-zero, so a missing or
+unusable index shows up before deploy rather than as a slow page.
+
+Run it against a copy seeded with production-like volumes: on a near-empty
+database MySQL happily scans and nothing is flagged.
+"""
+import threading
+
+from mysql.connector import Error
+
+DEFAULT_MIN_ROWS = 1000
+
+
+def normalize(sql):
+    return ' '.join(str(sql).split())
+
+
+def explainable(sql):
+    words = normalize(sql).lower().split(' ')
+    if words[0] in ('select', 'update', 'delete'):
+        return words[0] != 'select' or 'from' in words
+    # INSERT ... SELECT reads too; plain INSERT ... VALUES has no plan worth checking
+    return words[0] in ('insert', 'replace') and 'select' in words
+
+
+class StatementRecorder:
+    """Pool observer collecting the distinct statements issued by one thread.
+
+    Background threads (the live event feed, the search index loader) share
+    the pool; their statements aren't what the routes cost and are ignored.
+    """
+
+    def __init__(self):
+        self.statements = {}
+        self.route = None
+        self._thread = threading.get_ident()
+
+    def __call__(self, sql, params, seconds):
+        if threading.get_ident() != self._thread:
+            return
+        key = normalize(sql)
+        entry = self.statements.get(key)
+        if entry is None:
+            if isinstance(params, list):
+                params = tuple(params)
+            entry = self.statements[key] = {'sql': sql, 'params': params, 'routes': [], 'count': 0}
+        entry['count'] += 1
+        route = self.route or 'unknown'
+        if route not in entry['routes']:
+            entry['routes'].append(route)
+
+
+def run_probes(client, probes, recorder, log=print):
+    """Issue each ``(method, path, options)`` request, attributing statements to it.
+
+    Returns the JSON body of each response (None for pages and redirects).
+    """
+    results = []
+    for method, path, options in probes:
+        recorder.route = f"{method} {path}"
+        response = client.open(path, method=method, **(options or {}))
+        if response.status_code >= 500:
+            log(f"⚠️  {method} {path} returned {response.status_code}")
+        results.append(response.get_json(silent=True))
+        response.close()
+    recorder.route = None
+    return results
+
+
+def full_scans(plan, min_rows, allowed=()):
+    """Rows of an EXPLAIN result that read a table of ``min_rows``+ rows in full."""
+    found = []
+    for row in plan:
+        table = row.get('table') or ''
+        if row.get('type') != 'ALL' or table.startswith('<') or table in allowed:
+            continue
+        if int(row.get('rows') or 0) >= min_rows:
+            found.append(row)
+    return found
+
+
+def check_statements(db, statements, min_rows=DEFAULT_MIN_ROWS, allowed=(), log=print):
+    """EXPLAIN every recorded statement; return a list of findings."""
+    findings = []
+    cursor = db.cursor(dictionary=True)
+    try:
+        for entry in statements.values():
+            if not explainable(entry['sql']):
+                continue
+            if entry['params'] is None and '%s' in entry['sql']:
+                # executemany() batches aren't reported with their parameters
+                continue
+            try:
+                cursor.execute('EXPLAIN ' + entry['sql'], entry['params'])
+                plan = cursor.fetchall()
+            except Error as e:
+                log(f"⚠️  Could not EXPLAIN {normalize(entry['sql'])[:120]}: {e}")
+                continue
+            for row in full_scans(plan, min_rows, allowed):
+                findings.append({
+                    'table': row.get('table'),
+                    'rows': int(row.get('rows') or 0),
+                    'possible_keys': row.get('possible_keys'),
+                    'extra': row.get('Extra'),
+                    'routes': entry['routes'],
+                    'sql': normalize(entry['sql']),
+                })
+    finally:
+        cursor.close()
+    return findings
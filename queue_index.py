@@ -0,0 +1,220 @@
+"""In-memory per-department queue ranks.
+
+Answers "what is the position of queue entry X in its department" and "how
+many people are ahead of X" in O(log n) without scanning ``opd_queue``.
+The index is loaded once from the active queue rows and then kept current
+from the live event feed (and directly by the registering worker).
+"""
+import logging
+import threading
+import time
+
+from mysql.connector import Error
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('waiting', 'in_consultation')
+
+
+def is_active(status):
+    return (status or '').strip().lower().replace(' ', '_') in ACTIVE_STATUSES
+
+
+class FenwickTree:
+    """Binary indexed tree over 0/1 flags (1 = entry still in the queue)."""
+
+    def __init__(self, size=0):
+        self._tree = [0] * (size + 1)
+
+    def __len__(self):
+        return len(self._tree) - 1
+
+    def add(self, index, delta):
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, index):
+        """Sum of flags at positions 0..index inclusive."""
+        i = index + 1
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+
+class DepartmentQueue:
+    """Queue entries of one department ordered by queue_id."""
+
+    def __init__(self):
+        self._slots = []          # queue_ids in ascending order
+        self._slot_of = {}        # queue_id -> slot
+        self._active = set()
+        self._tree = FenwickTree(16)
+
+    def __len__(self):
+        return len(self._active)
+
+    def set_status(self, queue_id, active):
+        if active:
+            if queue_id in self._active:
+                return
+            if queue_id not in self._slot_of:
+                if self._slots and queue_id < self._slots[-1]:
+                    # Out-of-order arrival: rebuild once in sorted order.
+                    self._rebuild(extra=queue_id)
+                else:
+                    self._append(queue_id)
+            self._active.add(queue_id)
+            self._tree.add(self._slot_of[queue_id], 1)
+        elif queue_id in self._active:
+            self._active.discard(queue_id)
+            self._tree.add(self._slot_of[queue_id], -1)
+            if len(self._slots) > 64 and len(self._active) * 4 < len(self._slots):
+                self._rebuild()
+
+    def position(self, queue_id):
+        """1-based rank among active entries, or None if not active."""
+        if queue_id not in self._active:
+            return None
+        return self._tree.prefix_sum(self._slot_of[queue_id])
+
+    def _append(self, queue_id):
+        slot = len(self._slots)
+        if slot >= len(self._tree):
+            self._rebuild(capacity=max(16, len(self._tree) * 2))
+            slot = len(self._slots)
+        self._slots.append(queue_id)
+        self._slot_of[queue_id] = slot
+
+    def _rebuild(self, extra=None, capacity=None):
+        ids = sorted(self._active | ({extra} if extra is not None else set()))
+        self._slots = ids
+        self._slot_of = {qid: i for i, qid in enumerate(ids)}
+        self._tree = FenwickTree(max(capacity or 0, 16, len(ids) * 2))
+        for qid in self._active:
+            self._tree.add(self._slot_of[qid], 1)
+
+
+class QueueIndex:
+    """Thread-safe collection of department queues plus a queue_id lookup."""
+
+    def __init__(self, connect, resync_seconds=600):
+        self._connect = connect
+        self.resync_seconds = resync_seconds
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._departments = {}
+        self._department_of = {}
+        self._pending = None      # updates that arrived while a reload was reading
+        self._loaded_at = None
+
+    def _fresh(self):
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.resync_seconds
+
+    def _ensure_loaded(self):
+        if self._fresh():
+            return True
+        # One thread reloads; the others keep answering from the current
+        # snapshot (or, before the first load, wait for it).
+        if not self._reload_lock.acquire(blocking=self._loaded_at is None):
+            return True
+        try:
+            return self._fresh() or self._reload()
+        finally:
+            self._reload_lock.release()
+
+    def _reload(self):
+        db = self._connect()
+        if not db:
+            return self._loaded_at is not None
+        with self._lock:
+            self._pending = []
+        try:
+            cursor = db.cursor()
+            cursor.execute(
+                """
+                SELECT queue_id, department
+                FROM opd_queue
+                WHERE status IN ('waiting', 'in_consultation')
+                ORDER BY queue_id
+                """
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+        except Error as e:
+            logger.warning("Could not load queue index: %s", e)
+            with self._lock:
+                self._pending = None
+            return self._loaded_at is not None
+        finally:
+            db.close()
+
+        departments = {}
+        department_of = {}
+        for queue_id, department in rows:
+            queue = departments.setdefault(department, DepartmentQueue())
+            queue.set_status(int(queue_id), True)
+            department_of[int(queue_id)] = department
+        with self._lock:
+            # Transitions applied since the SELECT started may be missing
+            # from its rows; replaying them (in order) is idempotent.
+            for update in self._pending:
+                self._apply(departments, department_of, *update)
+            self._pending = None
+            self._departments = departments
+            self._department_of = department_of
+            self._loaded_at = time.monotonic()
+        return True
+
+    def update(self, queue_id, department, status):
+        """Apply a status transition for one queue entry (idempotent)."""
+        if queue_id is None:
+            return
+        queue_id = int(queue_id)
+        active = is_active(status)
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((queue_id, department, active))
+            self._apply(self._departments, self._department_of, queue_id, department, active)
+
+    @staticmethod
+    def _apply(departments, department_of, queue_id, department, active):
+        previous = department_of.get(queue_id)
+        if previous is not None and previous != department:
+            departments[previous].set_status(queue_id, False)
+        if active:
+            department_of[queue_id] = department
+            departments.setdefault(department, DepartmentQueue()).set_status(queue_id, True)
+        elif previous is not None:
+            departments[previous].set_status(queue_id, False)
+            department_of.pop(queue_id, None)
+
+    def apply_event(self, event):
+        """Live event feed listener for the ``opd_queue`` channel."""
+        payload = event.get('payload') or {}
+        status = 'removed' if event.get('type') == 'removed' else payload.get('queue_status')
+        self.update(payload.get('token_id'), event.get('department'), status)
+
+    def position(self, queue_id):
+        """Return ``(position, people_ahead)`` for an active entry, else None."""
+        if queue_id is None or not self._ensure_loaded():
+            return None
+        queue_id = int(queue_id)
+        with self._lock:
+            department = self._department_of.get(queue_id)
+            if department is None:
+                return None
+            position = self._departments[department].position(queue_id)
+        if position is None:
+            return None
+        return position, position - 1
+
+    def department_length(self, department):
+        if not self._ensure_loaded():
+            return None
+        with self._lock:
+            queue = self._departments.get(department)
+            return len(queue) if queue else 0
@@ -0,0 +1,66 @@
+"""Patient registration rules shared by the form and the bulk importer."""
+from datetime import datetime
+
+from token_allocator import department_key
+
+REQUIRED_FIELDS = ('name', 'age', 'department', 'phone')
+OPTIONAL_FIELDS = (
+    'email', 'gender', 'blood_group', 'date_of_birth',
+    'address', 'medical_history', 'emergency_contact'
+)
+
+
+class RegistrationError(ValueError):
+    """A submitted registration failed validation; the message is user-facing."""
+
+
+def validate_registration(form, today=None):
+    """Validate and normalise one registration.
+
+    ``form`` is any mapping with ``.get`` (request.form, a CSV row, a JSON
+    object). Returns a dict with the required and optional fields plus
+    ``appointment_date`` / ``appointment_time`` as date/time objects and the
+    department under its listed name, or raises RegistrationError with the
+    same messages the form shows.
+    """
+    def field(name):
+        value = form.get(name)
+        return str(value).strip() if value is not None else ''
+
+    record = {name: field(name) for name in REQUIRED_FIELDS + OPTIONAL_FIELDS}
+
+    appointment_date_raw = field('appointment_date')
+    appointment_time_raw = field('appointment_time')
+
+    if appointment_date_raw:
+        try:
+            record['appointment_date'] = datetime.strptime(appointment_date_raw, '%Y-%m-%d').date()
+        except ValueError:
+            raise RegistrationError('Please choose a valid appointment date.')
+    else:
+        record['appointment_date'] = today or datetime.today().date()
+
+    record['appointment_time'] = None
+    if appointment_time_raw:
+        try:
+            record['appointment_time'] = datetime.strptime(appointment_time_raw[:5], '%H:%M').time()
+        except ValueError:
+            raise RegistrationError('Please choose a valid appointment time.')
+
+    if not all(record[name] for name in REQUIRED_FIELDS):
+        raise RegistrationError('Name, Age, Department, and Phone are required!')
+
+    try:
+        age = int(record['age'])
+    except ValueError:
+        raise RegistrationError('Age must be a number')
+    if age < 1 or age > 150:
+        raise RegistrationError('Please enter a valid age (1-150)')
+    record['age'] = age
+
+    department = department_key(record['department'])
+    if department is None:
+        raise RegistrationError('Please choose a department from the list.')
+    record['department'] = department
+
+    return record
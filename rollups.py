@@ -0,0 +1,195 @@
+"""Per-day, per-department counters behind /reports.
+
+``daily_rollups`` holds one row per (day, department) with running counts of
+registrations, completed consultations, admissions and discharges plus the
+total and number of measured OPD waits. Write paths bump the counters in
+their own transaction with ``INSERT ... VALUES ... ON DUPLICATE KEY UPDATE``
+for the days and departments they touched, so the reports page sums a few
+hundred small rows instead of aggregating the patients table. ``rebuild``
+recomputes everything from history.
+"""
+from collections import namedtuple
+
+COUNTERS = ('registrations', 'consultations', 'admissions', 'discharges', 'waits')
+
+# What the counters need to know about one patient
+PatientState = namedtuple('PatientState', 'department status registered waited')
+
+
+def lock_patients(cursor, where, params, created_column):
+    """Lock the patients a write is about to change and return their ``PatientState``.
+
+    Call it *before* the status UPDATE. ``SELECT ... FOR UPDATE`` takes the
+    exclusive row locks that UPDATE needs anyway, up front, rather than the
+    shared locks of an ``INSERT ... SELECT`` that the UPDATE then has to
+    upgrade (two requests doing that deadlock). ``waited`` is the minutes
+    since registration.
+    """
+    cursor.execute(
+        f"""
+        SELECT COALESCE(department, ''), status, DATE({created_column}),
+               GREATEST(TIMESTAMPDIFF(MINUTE, {created_column}, NOW()), 0)
+        FROM patients
+        WHERE {where}
+        FOR UPDATE
+        """,
+        params
+    )
+    return [PatientState(*(row.values() if isinstance(row, dict) else row)) for row in cursor.fetchall()]
+
+
+def tally(patients, counter, new_status=None, delta=1):
+    """Group ``PatientState``s into ``bump`` counts.
+
+    With ``new_status``, patients already in that status are skipped, so a
+    repeated click doesn't count twice. Registrations are dated by the
+    patient's own registration day, everything else by today. ``delta=-1``
+    takes patients back out of a counter.
+    """
+    counts = {}
+    for patient in patients:
+        if new_status and patient.status == new_status:
+            continue
+        key = (patient.registered if counter == 'registrations' else None, patient.department)
+        if counter == 'waits':
+            minutes, waits = counts.get(key, (0, 0))
+            counts[key] = (minutes + delta * (patient.waited or 0), waits + delta)
+        else:
+            counts[key] = counts.get(key, 0) + delta
+    return counts
+
+
+def bump(cursor, counter, counts):
+    """Add ``counts`` to ``counter`` with one ``INSERT ... VALUES ... ON DUPLICATE KEY UPDATE``.
+
+    ``counts`` maps ``(day, department)`` to a number, or for ``waits`` to
+    ``(minutes, waits)``; a day of None is the database's today. Nothing is
+    read from patients, so only the daily_rollups rows are locked.
+    """
+    if counter not in COUNTERS:
+        raise ValueError(f"unknown rollup counter {counter!r}")
+    counts = {key: value for key, value in counts.items() if (any(value) if isinstance(value, tuple) else value)}
+    if not counts:
+        return
+    columns = ['wait_minutes', 'waits'] if counter == 'waits' else [counter]
+    rows, params = [], []
+    for (day, department), value in sorted(counts.items(), key=lambda item: (str(item[0][0]), item[0][1])):
+        rows.append(f"(COALESCE(%s, CURDATE()), %s, {', '.join(['%s'] * len(columns))})")
+        params += [day, department or ''] + (list(value) if counter == 'waits' else [value])
+    updates = [f"{column} = {column} + VALUES({column})" for column in columns]
+    cursor.execute(
+        f"""
+        INSERT INTO daily_rollups (day, department, {', '.join(columns)})
+        VALUES {', '.join(rows)}
+        ON DUPLICATE KEY UPDATE {', '.join(updates)}
+        """,
+        params
+    )
+
+
+def rebuild(db, created_column, updated_column=None, log=print):
+    """Recompute every rollup from the patients table and swap it in atomically.
+
+    Registrations are exact. History has no transition timestamps, so
+    consultations, admissions and discharges are dated by ``updated_column``
+    (the last change of the row, falling back to registration) and past
+    waits can't be recovered. Run it in a quiet period: counters bumped
+    while it runs are lost in the swap.
+    """
+    event_day = f"DATE(COALESCE({updated_column}, {created_column}))" if updated_column else f"DATE({created_column})"
+    statements = [
+        ('registrations', f"DATE({created_column})", "1=1"),
+        ('consultations', event_day, "status IN ('Consulted', 'Completed')"),
+        ('admissions', event_day, "status IN ('Admitted', 'Discharged')"),
+        ('discharges', event_day, "status = 'Discharged'"),
+    ]
+    cursor = db.cursor()
+    try:
+        cursor.execute("DROP TABLE IF EXISTS daily_rollups_rebuild")
+        cursor.execute("CREATE TABLE daily_rollups_rebuild LIKE daily_rollups")
+        for counter, day, where in statements:
+            log(f"📊 Rebuilding {counter}...")
+            cursor.execute(
+                f"""
+                INSERT INTO daily_rollups_rebuild (day, department, {counter})
+                SELECT {day}, COALESCE(department, ''), COUNT(*)
+                FROM patients
+                WHERE {where} AND {created_column} IS NOT NULL
+                GROUP BY {day}, COALESCE(department, '')
+                ON DUPLICATE KEY UPDATE {counter} = VALUES({counter})
+                """
+            )
+            db.commit()
+        cursor.execute(
+            "RENAME TABLE daily_rollups TO daily_rollups_old, daily_rollups_rebuild TO daily_rollups"
+        )
+        cursor.execute("DROP TABLE daily_rollups_old")
+        cursor.execute("SELECT COUNT(*) FROM daily_rollups")
+        return int(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+
+
+def report_totals(cursor):
+    """Headline numbers for /reports from the rollups (a dict of ints).
+
+    Dates are taken from the database clock, the same one that dated the
+    counters. Weeks start on Sunday, as YEARWEEK() counted them before.
+    """
+    cursor.execute(
+        """
+        SELECT
+            COALESCE(SUM(registrations), 0) AS total_patients,
+            COALESCE(SUM(CASE WHEN day = CURDATE() THEN registrations END), 0) AS patients_today,
+            COALESCE(SUM(CASE WHEN day >= CURDATE() - INTERVAL (DAYOFWEEK(CURDATE()) - 1) DAY
+                              THEN registrations END), 0) AS patients_this_week,
+            COALESCE(SUM(CASE WHEN day >= CURDATE() - INTERVAL (DAYOFMONTH(CURDATE()) - 1) DAY
+                              THEN registrations END), 0) AS patients_this_month,
+            COALESCE(SUM(consultations), 0) AS total_consultations,
+            COALESCE(SUM(CASE WHEN day = CURDATE() THEN consultations END), 0) AS consultations_today,
+            COALESCE(SUM(admissions), 0) AS total_admissions,
+            COALESCE(SUM(CASE WHEN day = CURDATE() THEN admissions END), 0) AS admissions_today,
+            COALESCE(SUM(discharges), 0) AS total_discharges,
+            COALESCE(SUM(CASE WHEN day >= CURDATE() - INTERVAL 30 DAY THEN wait_minutes END), 0) AS recent_wait_minutes,
+            COALESCE(SUM(CASE WHEN day >= CURDATE() - INTERVAL 30 DAY THEN waits END), 0) AS recent_waits
+        FROM daily_rollups
+        """
+    )
+    row = cursor.fetchone() or {}
+    return {key: int(value or 0) for key, value in row.items()}
+
+
+def department_totals(cursor):
+    cursor.execute(
+        """
+        SELECT department,
+               SUM(registrations) AS total_patients,
+               SUM(consultations) AS completed
+        FROM daily_rollups
+        WHERE department <> ''
+        GROUP BY department
+        ORDER BY total_patients DESC
+        """
+    )
+    return [
+        {'department': row['department'], 'total_patients': int(row['total_patients'] or 0),
+         'completed': int(row['completed'] or 0)}
+        for row in cursor.fetchall()
+    ]
+
+
+def monthly_registrations(cursor, months=6):
+    cursor.execute(
+        """
+        SELECT DATE_FORMAT(day, '%%Y-%%m') AS month, SUM(registrations) AS patient_count
+        FROM daily_rollups
+        WHERE day >= DATE_SUB(CURDATE(), INTERVAL %s MONTH)
+        GROUP BY DATE_FORMAT(day, '%%Y-%%m')
+        ORDER BY month ASC
+        """,
+        (months,)
+    )
+    return [
+        {'month': row['month'], 'patient_count': int(row['patient_count'] or 0)}
+        for row in cursor.fetchall()
+    ]
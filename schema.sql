@@ -44,3 +44,6 @@ CREATE TABLE IF NOT EXISTS admin_users (
 INSERT IGNORE INTO admin_users (username, password, full_name, role)
 VALUES ('admin', 'admin', 'Administrator', 'Admin');
 
+
+-- Tables owned by the app (patient_appointments, live_events, ...) are created
+-- and versioned by migrations.py. Apply them with: flask --app app db-upgrade
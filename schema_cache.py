@@ -0,0 +1,97 @@
+"""Per-process cache of table columns and the SQL statements built from them.
+
+The deployed databases don't all share one patients layout (some have
+``id``, some ``patient_id``; optional columns such as ``blood_group`` come
+and go). Instead of probing with ``SHOW COLUMNS`` or try/except fallbacks on
+every request, columns are read once from information_schema and reused
+until ``refresh()`` is called after a migration.
+"""
+import logging
+import threading
+
+from mysql.connector import Error
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaCache:
+    def __init__(self, connect):
+        self._connect = connect
+        self._columns = None
+        self._statements = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Forget what was learned; the next lookup reloads every table at once."""
+        with self._lock:
+            self._columns = None
+            self._statements = {}
+
+    def _load(self):
+        db = self._connect()
+        if not db:
+            return None
+        try:
+            cursor = db.cursor()
+            cursor.execute(
+                """
+                SELECT TABLE_NAME, COLUMN_NAME
+                FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE()
+                ORDER BY TABLE_NAME, ORDINAL_POSITION
+                """
+            )
+            columns = {}
+            for table, column in cursor.fetchall():
+                columns.setdefault(str(table), []).append(str(column))
+            cursor.close()
+            return {table: tuple(cols) for table, cols in columns.items()}
+        except Error as e:
+            logger.warning("Could not load table columns: %s", e)
+            return None
+        finally:
+            db.close()
+
+    def columns(self, table):
+        """Column names of ``table`` in definition order, or None if unknown."""
+        if self._columns is None:
+            with self._lock:
+                if self._columns is None:
+                    self._columns = self._load()
+        if self._columns is None:
+            return None
+        return self._columns.get(table, ())
+
+    def has_column(self, table, column):
+        cols = self.columns(table)
+        return bool(cols) and column in cols
+
+    def first_column(self, table, candidates, default=None):
+        """Return the first of ``candidates`` that exists in ``table``."""
+        cols = self.columns(table) or ()
+        for candidate in candidates:
+            if candidate in cols:
+                return candidate
+        return default
+
+    def insert(self, table, values, required=()):
+        """Return ``(sql, params)`` inserting the non-empty ``values`` that exist as columns.
+
+        Columns in ``required`` are always included; optional ones are dropped
+        while the columns are unknown. The SQL text is compiled once per
+        distinct column set and then reused.
+        """
+        cols = self.columns(table)
+        names = []
+        for name, value in values.items():
+            if name in required:
+                names.append(name)
+            elif value not in (None, '') and cols and name in cols:
+                names.append(name)
+        key = ('insert', table, tuple(names))
+        sql = self._statements.get(key)
+        if sql is None:
+            placeholders = ', '.join(['%s'] * len(names))
+            sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({placeholders})"
+            self._statements[key] = sql
+        return sql, [values[name] for name in names]
@@ -0,0 +1,238 @@
+"""In-process trigram index for patient search.
+
+Substring search over name, phone, gender and appointment tokens used to be
+``LIKE '%term%'`` ORed across columns, which MySQL can only answer with a
+full scan. This index keeps the searchable text of every patient in memory
+with a trigram -> patient_id posting map, so a lookup intersects a few
+posting sets and verifies the survivors instead of scanning.
+
+It is loaded in a background thread per worker and kept current from the
+``patients`` channel of the live event feed. ``search`` returns None while
+the index is cold, and for terms shorter than a trigram (which would have
+to walk the whole posting map), so callers can fall back to SQL.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+
+from mysql.connector import Error
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('name', 'phone', 'gender', 'tokens')
+# ``id`` (the patient id as text) is indexed too but only searched on request.
+INDEXED_FIELDS = FIELDS + ('id',)
+
+# Shorter terms are left to the callers' LIMITed SQL.
+MIN_TERM_LENGTH = 3
+
+# Match classes, best first.
+EXACT, PREFIX, SUBSTRING, FUZZY = 0, 1, 2, 3
+
+
+def normalize(text):
+    return ' '.join(str(text or '').lower().split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _match_class(value, term):
+    if value == term:
+        return EXACT
+    if value.startswith(term):
+        return PREFIX
+    if term in value:
+        return SUBSTRING
+    return None
+
+
+class PatientSearchIndex:
+    def __init__(self, connect, resync_seconds=1800, fuzzy_threshold=0.3):
+        self._connect = connect
+        self.resync_seconds = resync_seconds
+        self.fuzzy_threshold = fuzzy_threshold
+        self._lock = threading.Lock()
+        self._docs = {}           # patient_id -> {field: [normalized values]}
+        self._postings = {}       # trigram -> set(patient_id)
+        self._loaded_at = None
+        self._loading = False
+        self._buffered = None     # events seen while a load is in flight
+
+    @property
+    def ready(self):
+        return self._loaded_at is not None
+
+    def warm(self):
+        """Start a background (re)load when cold or stale. Cheap to call per request."""
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.resync_seconds:
+            return
+        with self._lock:
+            if self._loading:
+                return
+            self._loading = True
+            self._buffered = []
+        threading.Thread(target=self._load, name='patient-search-index', daemon=True).start()
+
+    def _load(self):
+        docs, postings = {}, {}
+        db = None
+        try:
+            db = self._connect()
+            if not db:
+                raise Error(msg='no database connection')
+            cursor = db.cursor()
+            cursor.execute("SELECT patient_id, name, phone, gender FROM patients")
+            for patient_id, name, phone, gender in cursor:
+                self._index(docs, postings, int(patient_id), {'name': name, 'phone': phone, 'gender': gender})
+            cursor.execute(
+                "SELECT patient_id, token_number FROM patient_appointments WHERE token_number IS NOT NULL"
+            )
+            for patient_id, token in cursor:
+                doc = docs.get(int(patient_id))
+                if doc is not None:
+                    self._add_values(postings, int(patient_id), doc, 'tokens', [token])
+            cursor.close()
+        except Error as e:
+            logger.warning("Could not build patient search index: %s", e)
+            with self._lock:
+                self._loading = False
+                self._buffered = None
+            return
+        finally:
+            if db:
+                db.close()
+
+        with self._lock:
+            self._docs, self._postings = docs, postings
+            self._loaded_at = time.monotonic()
+            self._loading = False
+            buffered, self._buffered = self._buffered or [], None
+        # Events that arrived during the load may be newer than the snapshot.
+        for event in buffered:
+            self.apply_event(event)
+        logger.info("Patient search index ready (%s patients)", len(docs))
+
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _add_values(postings, patient_id, doc, field, values):
+        for value in values:
+            value = normalize(value)
+            if not value or value in doc.setdefault(field, []):
+                continue
+            doc[field].append(value)
+            for gram in trigrams(value):
+                postings.setdefault(gram, set()).add(patient_id)
+
+    @classmethod
+    def _index(cls, docs, postings, patient_id, fields):
+        doc = docs[patient_id] = {}
+        fields = dict(fields, id=patient_id)
+        for field in INDEXED_FIELDS:
+            value = fields.get(field)
+            values = value if isinstance(value, (list, tuple)) else [value]
+            cls._add_values(postings, patient_id, doc, field, values)
+
+    def _drop(self, patient_id):
+        doc = self._docs.pop(patient_id, None)
+        if not doc:
+            return
+        for values in doc.values():
+            for value in values:
+                for gram in trigrams(value):
+                    ids = self._postings.get(gram)
+                    if ids is not None:
+                        ids.discard(patient_id)
+                        if not ids:
+                            del self._postings[gram]
+
+    def upsert(self, patient_id, **fields):
+        """Replace the searchable text of one patient."""
+        patient_id = int(patient_id)
+        with self._lock:
+            self._drop(patient_id)
+            self._index(self._docs, self._postings, patient_id, fields)
+
+    def remove(self, patient_id):
+        with self._lock:
+            self._drop(int(patient_id))
+
+    def apply_event(self, event):
+        """Live event feed listener for the ``patients`` channel."""
+        with self._lock:
+            if self._buffered is not None:
+                self._buffered.append(event)
+        patient_id = event.get('patient_id')
+        if patient_id is None:
+            return
+        if event.get('type') == 'removed':
+            self.remove(patient_id)
+        else:
+            payload = event.get('payload') or {}
+            self.upsert(patient_id, **{field: payload.get(field) for field in FIELDS})
+
+    # ------------------------------------------------------------------
+    def search(self, term, fields=FIELDS, limit=None, fuzzy=False, prefix=False):
+        """Return matching patient ids, best match first (newest first within a class).
+
+        Substring matches on any of ``fields`` (only exact and prefix matches
+        with ``prefix``); with ``fuzzy`` also values whose trigram similarity
+        to ``term`` clears the threshold. Returns None while the index is cold
+        or ``term`` is shorter than MIN_TERM_LENGTH.
+        """
+        if self._loaded_at is None:
+            return None
+        term = normalize(term)
+        if not term:
+            return []
+        if len(term) < MIN_TERM_LENGTH:
+            return None
+        grams = trigrams(term) - {'   '}
+        with self._lock:
+            # Every substring match contains the term's unpadded trigrams.
+            inner = sorted((self._postings.get(g, ()) for g in grams if g.strip() == g), key=len)
+            candidates = set(inner[0]).intersection(*inner[1:])
+            ranked = {}
+            for patient_id in candidates:
+                best = self._best_class(self._docs.get(patient_id), term, fields)
+                if best is not None and not (prefix and best > PREFIX):
+                    ranked[patient_id] = best
+            if fuzzy and not prefix:
+                shared = Counter()
+                for gram in grams:
+                    for patient_id in self._postings.get(gram, ()):
+                        if patient_id not in ranked:
+                            shared[patient_id] += 1
+                needed = max(1, int(len(grams) * self.fuzzy_threshold))
+                for patient_id, count in shared.items():
+                    if count >= needed and self._similar(self._docs[patient_id], grams, fields):
+                        ranked[patient_id] = FUZZY
+        ordered = sorted(ranked, key=lambda pid: (ranked[pid], -pid))
+        return ordered[:limit] if limit else ordered
+
+    @staticmethod
+    def _best_class(doc, term, fields):
+        if not doc:
+            return None
+        best = None
+        for field in fields:
+            for value in doc.get(field, ()):
+                found = _match_class(value, term)
+                if found is not None and (best is None or found < best):
+                    best = found
+        return best
+
+    def _similar(self, doc, grams, fields):
+        for field in fields:
+            if field in ('gender', 'id'):
+                continue
+            for value in doc.get(field, ()):
+                # Compare against the whole value and each word ("jhon" ~ "john smith").
+                for part in [value] + value.split():
+                    part_grams = trigrams(part)
+                    if len(grams & part_grams) / float(len(grams | part_grams)) >= self.fuzzy_threshold:
+                        return True
+        return False
@@ -0,0 +1,236 @@
+"""JSON logging that stays off the request path.
+
+Handlers on the request path only put records on a bounded in-memory queue
+(``QueueHandler``); one writer thread per worker formats them as one JSON
+object per line and writes them to stdout and, optionally, a size-rotated
+file. When a burst fills the queue, records are dropped and counted instead
+of blocking the worker, and the next record that gets through carries the
+count.
+
+The writer is a native OS thread even under gevent's monkey-patching,
+where ``threading.Thread`` would be a greenlet on the worker's only thread
+and a stalled stdout pipe or disk would stall every request with it. The
+queue is the C ``SimpleQueue``, which gevent leaves alone and which is safe
+to fill from greenlets and drain from a real thread.
+
+Records get the request id of the request that logged them. Warnings and
+errors are sampled per call site: after ``burst`` records from the same
+line within ``window`` seconds the rest are suppressed, and the first
+record of the next window reports how many were.
+"""
+import _thread
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from _queue import SimpleQueue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, RotatingFileHandler
+
+from flask import g, has_request_context
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+
+# Attributes every LogRecord has; anything else was passed with ``extra=``.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+_OWN_ATTRIBUTES = {'request_id', 'suppressed', 'dropped'}
+_STOP = object()
+
+
+def native_thread_primitives():
+    """``(start_new_thread, allocate_lock)`` of real OS threads, even after gevent patched them."""
+    monkey = sys.modules.get('gevent.monkey')
+    if monkey is not None and monkey.is_module_patched('threading'):
+        return monkey.get_original('_thread', 'start_new_thread'), monkey.get_original('_thread', 'allocate_lock')
+    return _thread.start_new_thread, _thread.allocate_lock
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+        }
+        for key in ('request_id', 'suppressed', 'dropped'):
+            value = getattr(record, key, None)
+            if value:
+                entry[key] = value
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in _OWN_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RequestIdFilter(logging.Filter):
+    """Tag records with ``g.request_id`` (runs on the calling thread, inside the request)."""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id') and has_request_context():
+            record.request_id = g.get('request_id')
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Let through at most ``burst`` warnings/errors per call site and window."""
+
+    def __init__(self, burst=10, window=60.0, level=logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.level = level
+        self._lock = threading.Lock()
+        self._sites = {}          # (pathname, lineno) -> [window start, passed, suppressed]
+
+    def filter(self, record):
+        if record.levelno < self.level or self.burst <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get((record.pathname, record.lineno))
+            if site is None or now - site[0] >= self.window:
+                suppressed = site[2] if site else 0
+                self._sites[(record.pathname, record.lineno)] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Enqueue without waiting; past ``maxsize`` queued records drop the record and count it."""
+
+    def __init__(self, log_queue, maxsize=DEFAULT_QUEUE_SIZE):
+        super().__init__(log_queue)
+        self.maxsize = maxsize
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Render the message and traceback now, while args and frames are
+        # still valid; the JSON encoding and the write happen on the listener.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.stack_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.dropped:
+            record.dropped, self.dropped = self.dropped, 0
+        if self.queue.qsize() >= self.maxsize:
+            self.dropped += 1 + (getattr(record, 'dropped', 0) or 0)
+            return
+        self.queue.put_nowait(record)
+
+
+class LogWriter:
+    """Drains the queue into ``writers`` on a native OS thread."""
+
+    def __init__(self, log_queue, *writers):
+        self.queue = log_queue
+        self.handlers = writers
+        self._done = None
+
+    def start(self):
+        start_new_thread, allocate_lock = native_thread_primitives()
+        self._done = allocate_lock()
+        self._done.acquire()
+        start_new_thread(self._run, ())
+
+    def _run(self):
+        try:
+            while True:
+                record = self.queue.get()
+                if record is _STOP:
+                    return
+                for writer in self.handlers:
+                    writer.handle(record)
+        finally:
+            self._done.release()
+
+    def stop(self, timeout=5.0):
+        """Write what is queued, then end the thread; gives up after ``timeout`` seconds."""
+        self.queue.put(_STOP)
+        if self._done.acquire(timeout=timeout):
+            self._done.release()
+
+
+class LogPipeline:
+    """Root logging for one process; ``start`` is safe to call on every request."""
+
+    def __init__(self, level='INFO', log_file=None, max_bytes=DEFAULT_MAX_BYTES, backups=DEFAULT_BACKUPS,
+                 queue_size=DEFAULT_QUEUE_SIZE, sample_burst=10, sample_window=60.0, stdout=True):
+        self.level = logging.getLevelName(str(level).upper()) if isinstance(level, str) else level
+        self.log_file = log_file
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.stdout = stdout
+        self.queue = SimpleQueue()
+        self.handler = NonBlockingQueueHandler(self.queue, queue_size)
+        self.handler.addFilter(RequestIdFilter())
+        self.handler.addFilter(SamplingFilter(sample_burst, sample_window))
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _writers(self):
+        formatter = JsonFormatter()
+        writers = []
+        if self.stdout:
+            writers.append(logging.StreamHandler(sys.stdout))
+        if self.log_file:
+            # One file per worker: rotation isn't safe across processes.
+            path = self.log_file.format(pid=os.getpid())
+            writers.append(RotatingFileHandler(path, maxBytes=self.max_bytes, backupCount=self.backups,
+                                               encoding='utf-8', delay=True))
+        for writer in writers:
+            writer.setFormatter(formatter)
+        return writers
+
+    def install(self, logger=None):
+        logger = logger or logging.getLogger()
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(self.handler)
+        logger.setLevel(self.level)
+        self.start()
+        return self
+
+    def start(self):
+        """Start the writer thread (again, in a forked worker)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Forked: the parent's queue may hold records (or a lock) of its own.
+                self.queue = SimpleQueue()
+                self.handler.queue = self.queue
+            self._listener = LogWriter(self.queue, *self._writers())
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        """Flush what is queued and stop the writer thread."""
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+                for writer in self._listener.handlers:
+                    writer.close()
+            self._listener = None
+            self._pid = None
@@ -0,0 +1,79 @@
+"""Rendered template fragments, reused until their inputs change.
+
+Templates wrap a block in ``{% call cached_fragment('name', *parts, channels=(...)) %}``.
+The fragment is stored under its name, the viewer's role and the ``parts``
+(the values the block renders from); it is rendered again when any of
+the live-event data versions of ``channels`` has moved since, or after
+``ttl`` seconds as a bound for changes that publish no event. Each key
+keeps only its latest rendering, and expired keys are pruned once there
+are more than ``max_entries``.
+
+The versions a fragment is stored under must be no newer than the data it
+was rendered from, or an event that lands between loading the data and
+rendering the template would file old HTML under the new version. Callers
+take a ``snapshot`` of the versions before they load anything and pass it
+to ``render``; a channel pinned to None in the snapshot is rendered but not
+stored.
+"""
+import threading
+import time
+
+from markupsafe import Markup
+
+
+class FragmentCache:
+    def __init__(self, version_of, ttl=300.0, max_entries=1000):
+        self._version_of = version_of      # channel -> (version, changed_at) or None
+        self.ttl = float(ttl)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._fragments = {}               # key -> (versions, expires, html)
+        self.hits = 0
+        self.misses = 0
+
+    def snapshot(self, channels):
+        """``{channel: version}`` as of now (None before the feed's first poll)."""
+        return {channel: (self._version_of(channel) or (None,))[0] for channel in channels}
+
+    def _versions(self, channels, snapshot=None):
+        versions = []
+        for channel in channels:
+            if snapshot is not None and channel in snapshot:
+                version = snapshot[channel]
+            else:
+                version = (self._version_of(channel) or (None,))[0]
+            if version is None:
+                return None
+            versions.append(version)
+        return tuple(versions)
+
+    def render(self, key, channels, render, snapshot=None):
+        """Cached HTML for ``key`` or ``render()``'s, stored when the versions are known.
+
+        ``snapshot`` holds the versions taken before the data was loaded;
+        channels it doesn't name are read now.
+        """
+        versions = self._versions(channels, snapshot)
+        now = time.monotonic()
+        entry = self._fragments.get(key)
+        if versions is not None and entry and entry[0] == versions and entry[1] > now:
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        html = Markup(render())
+        if versions is not None:
+            with self._lock:
+                if len(self._fragments) >= self.max_entries:
+                    self._prune(now)
+                self._fragments[key] = (versions, now + self.ttl, html)
+        return html
+
+    def _prune(self, now):
+        for key in [k for k, entry in self._fragments.items() if entry[1] <= now]:
+            del self._fragments[key]
+        if len(self._fragments) >= self.max_entries:
+            self._fragments.clear()
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
@@ -0,0 +1,52 @@
+-- Base tables of a deployed MediFlow database, as the route handlers use
+-- them. The tables the app owns (patient_appointments, live_events, ...)
+-- are created on top of these by migrations.py.
+
+CREATE TABLE patients (
+    patient_id INT PRIMARY KEY AUTO_INCREMENT,
+    token INT,
+    name VARCHAR(100) NOT NULL,
+    age INT NOT NULL,
+    gender VARCHAR(20),
+    blood_group VARCHAR(10),
+    date_of_birth DATE,
+    phone VARCHAR(20),
+    email VARCHAR(150),
+    address TEXT,
+    medical_history TEXT,
+    emergency_contact VARCHAR(100),
+    department VARCHAR(100),
+    status VARCHAR(30) DEFAULT 'Registered',
+    bed_id VARCHAR(20),
+    assigned_doctor VARCHAR(100),
+    registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+CREATE TABLE opd_queue (
+    queue_id INT PRIMARY KEY AUTO_INCREMENT,
+    patient_id INT,
+    department VARCHAR(100),
+    status VARCHAR(20) DEFAULT 'Waiting',
+    token INT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE beds (
+    bed_id INT PRIMARY KEY AUTO_INCREMENT,
+    bed_name VARCHAR(20) UNIQUE NOT NULL,
+    bed_number VARCHAR(20),
+    ward VARCHAR(50),
+    status VARCHAR(20) DEFAULT 'Available',
+    patient_id INT NULL,
+    allocation_date TIMESTAMP NULL
+);
+
+CREATE TABLE admin_users (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    username VARCHAR(100) NOT NULL UNIQUE,
+    password VARCHAR(255) NOT NULL,
+    full_name VARCHAR(200),
+    role VARCHAR(100) DEFAULT 'Admin',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,126 @@
+"""Bed allocation under concurrent admissions, driven through the routes."""
+import threading
+
+import pytest
+
+WORKERS = 24
+DOCTOR = 'Dr. Drill'
+
+
+@pytest.fixture
+def ward(execute):
+    """Empties the bed, patient and queue tables after the test, whatever happened."""
+    try:
+        yield
+    finally:
+        for table in ('beds', 'opd_queue', 'patient_appointments', 'patients'):
+            execute(f"DELETE FROM {table}")
+
+
+def add_beds(execute, ward_name, prefix, count):
+    values = ', '.join(['(%s, %s, %s, %s)'] * count)
+    params = []
+    for i in range(count):
+        name = f"{prefix}-{i + 1:02d}"
+        params += [name, name, ward_name, 'Available']
+    execute(f"INSERT INTO beds (bed_name, bed_number, ward, status) VALUES {values}", params)
+    return execute("SELECT bed_id, bed_name FROM beds WHERE ward = %s ORDER BY bed_id", (ward_name,))
+
+
+def add_waiting_patients(execute, department, count):
+    values = ', '.join(['(%s, 40, %s, %s, %s)'] * count)
+    params = []
+    for i in range(count):
+        params += [f"Drill Patient {i + 1}", '9000000000', department, 'Waiting']
+    execute(f"INSERT INTO patients (name, age, phone, department, status) VALUES {values}", params)
+    execute(
+        """
+        INSERT INTO opd_queue (patient_id, department, status, token)
+        SELECT patient_id, department, 'waiting', patient_id FROM patients WHERE status = 'Waiting'
+        """
+    )
+    return [row['patient_id'] for row in execute(
+        "SELECT patient_id FROM patients WHERE department = %s ORDER BY patient_id", (department,)
+    )]
+
+
+def run_together(jobs, admin_client, workers=WORKERS):
+    """Run ``job(client)`` for every job from ``workers`` threads released at once."""
+    results = [None] * len(jobs)
+    start = threading.Barrier(workers)
+
+    def work(indices):
+        client = admin_client()
+        start.wait()
+        for i in indices:
+            try:
+                results[i] = jobs[i](client)
+            except Exception as e:
+                results[i] = e
+
+    threads = [threading.Thread(target=work, args=(range(w, len(jobs), workers),)) for w in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_admissions_never_share_a_bed(ward, execute, admin_client):
+    cardiology = add_beds(execute, 'Cardiology Ward', 'CARD', 10)
+    general = add_beds(execute, 'General Ward', 'GEN', 10)
+    patients = add_waiting_patients(execute, 'Cardiology', 80)
+    # The named-bed routes all aim at a few beds so they collide with each
+    # other and with the automatic allocation.
+    hot = cardiology[:3] + general[:3]
+
+    def job(i, patient_id):
+        bed = hot[i % len(hot)]
+        kind = i % 4
+        if kind == 0:
+            return 'admit', patient_id, lambda c: c.post(f'/admit-patient/{patient_id}')
+        if kind == 1:
+            return 'assign', patient_id, lambda c: c.post('/api/assign-bed', json={
+                'patient_id': patient_id, 'bed_name': bed['bed_name'], 'doctor_name': DOCTOR})
+        if kind == 2:
+            return 'assign_waiting', patient_id, lambda c: c.post('/api/assign-bed-to-patient', json={
+                'patient_id': patient_id, 'bed_id': bed['bed_id'], 'doctor_name': DOCTOR})
+        return 'walk_in', None, lambda c: c.post('/api/assign-bed-patient', json={
+            'bed_id': bed['bed_id'], 'patient_name': f"Walk-in {i}", 'doctor_name': DOCTOR,
+            'department': 'Cardiology'})
+
+    planned = [job(i, patient_id) for i, patient_id in enumerate(patients)]
+    responses = run_together([request for _, _, request in planned], admin_client)
+
+    errors = [r for r in responses if isinstance(r, Exception) or r.status_code not in (200, 400, 409)]
+    assert not errors, [getattr(r, 'status_code', r) for r in errors]
+    won = [(kind, patient_id) for (kind, patient_id, _), r in zip(planned, responses) if r.get_json()['success']]
+    assert won
+
+    occupied = execute("SELECT bed_id, patient_id, status, allocation_date FROM beds WHERE status = 'Occupied'")
+    assert len(occupied) == len(won) <= len(cardiology) + len(general)
+    # Every claim path writes the same status and stamps the allocation
+    assert all(bed['status'] == 'Occupied' and bed['allocation_date'] for bed in occupied)
+    holders = [bed['patient_id'] for bed in occupied]
+    assert None not in holders
+    assert len(set(holders)) == len(holders), 'a patient holds two beds'
+
+    admitted = {row['patient_id'] for row in execute("SELECT patient_id FROM patients WHERE status = 'Admitted'")}
+    assert admitted == set(holders)
+    # Requests that lost the race left their patient untouched
+    losers = {patient_id for (kind, patient_id, _), r in zip(planned, responses)
+              if patient_id is not None and not r.get_json()['success']}
+    assert not losers & admitted
+
+
+def test_admission_prefers_department_ward_then_general(ward, execute, admin_client):
+    add_beds(execute, 'Cardiology Ward', 'CARD', 1)
+    add_beds(execute, 'General Ward', 'GEN', 1)
+    first, second, third = add_waiting_patients(execute, 'Cardiology', 3)
+    client = admin_client()
+
+    assert client.post(f'/admit-patient/{first}').get_json()['ward_name'] == 'Cardiology Ward'
+    assert client.post(f'/admit-patient/{second}').get_json()['ward_name'] == 'General Ward'
+    response = client.post(f'/admit-patient/{third}')
+    assert response.status_code == 400
+    assert not response.get_json()['success']
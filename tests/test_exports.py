@@ -0,0 +1,27 @@
+"""Export rendering."""
+import csv
+import io
+import json
+
+from exports import render
+
+
+def test_csv_cells_never_start_a_formula():
+    rows = [
+        {'name': '=HYPERLINK("http://evil.example","x")', 'phone': '+cmd|\' /C calc\'!A0', 'age': -3},
+        {'name': '@SUM(A1)', 'phone': '-1+1', 'age': 40},
+        {'name': '\tTabbed', 'phone': '\rreturn', 'age': 41},
+        {'name': 'Asha Rao', 'phone': '9000000000', 'age': 42},
+    ]
+    parsed = list(csv.DictReader(io.StringIO(''.join(render(rows, 'csv')))))
+    assert [row['name'] for row in parsed] == [
+        '\'=HYPERLINK("http://evil.example","x")', "'@SUM(A1)", "'\tTabbed", 'Asha Rao',
+    ]
+    assert [row['phone'] for row in parsed] == ["'+cmd|' /C calc'!A0", "'-1+1", "'\rreturn", '9000000000']
+    # Numbers are numbers, not text a spreadsheet would evaluate
+    assert parsed[0]['age'] == '-3'
+
+
+def test_ndjson_keeps_values_as_they_are():
+    rows = [{'name': '=1+1'}]
+    assert json.loads(''.join(render(rows, 'ndjson'))) == {'name': '=1+1'}
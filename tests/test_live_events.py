@@ -0,0 +1,21 @@
+"""Channel versions used as ETags are comparable across workers."""
+from live_events import EventFeed
+
+
+def feed_at(last_id):
+    feed = EventFeed(connect=lambda: None)
+    feed._last_id = last_id
+    feed._channel_ids['beds'] = last_id
+    return feed
+
+
+def test_pending_writes_in_two_workers_give_different_versions():
+    first, second = feed_at(41), feed_at(41)
+    assert first.version('beds')[0] == second.version('beds')[0] == '41'
+    first.mark_changed('beds')
+    second.mark_changed('beds')
+    assert first.version('beds')[0] != second.version('beds')[0]
+    assert first.version('beds')[0].startswith('41.')
+
+    first.mark_changed('beds')
+    assert first.version('beds')[0].endswith('.2')
@@ -0,0 +1,23 @@
+"""Worker snapshots are summed without one worker's file replacing another's."""
+from metrics import Metrics
+
+
+def serve(metrics, count):
+    for _ in range(count):
+        metrics.begin()
+        metrics.finish('index', 'GET', 200, 0.01)
+    metrics.flush()
+
+
+def test_worker_reusing_a_pid_does_not_overwrite_an_old_snapshot(tmp_path):
+    exited, reused = Metrics(str(tmp_path)), Metrics(str(tmp_path))
+    serve(exited, 3)
+    serve(reused, 1)          # same pid, new process start
+    assert len(list(tmp_path.glob('*.json'))) == 2
+    assert Metrics(str(tmp_path)).collect()['requests'] == {'index|GET|200': 4}
+
+
+def test_reset_starts_the_totals_again(tmp_path):
+    serve(Metrics(str(tmp_path)), 2)
+    assert Metrics(str(tmp_path)).reset() == 1
+    assert Metrics(str(tmp_path)).collect()['requests'] == {}
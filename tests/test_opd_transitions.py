@@ -0,0 +1,25 @@
+"""Batch OPD transitions change the patient's latest queue row and nothing else."""
+
+
+def test_transition_leaves_earlier_visits_alone(execute, admin_client):
+    try:
+        execute(
+            "INSERT INTO patients (name, age, phone, department, status) VALUES (%s, 40, %s, %s, %s)",
+            ('Return Visit', '9000000000', 'ENT', 'Waiting')
+        )
+        [patient] = execute("SELECT patient_id FROM patients WHERE name = 'Return Visit'")
+        patient_id = patient['patient_id']
+        execute(
+            "INSERT INTO opd_queue (patient_id, department, status, token) VALUES (%s, %s, %s, 1), (%s, %s, %s, 2)",
+            (patient_id, 'ENT', 'completed', patient_id, 'ENT', 'waiting')
+        )
+
+        response = admin_client().post('/api/opd-queue/transitions', json={
+            'transitions': [{'patient_id': patient_id, 'action': 'start'}]})
+        assert response.get_json()['applied'] == 1
+
+        rows = execute("SELECT status FROM opd_queue WHERE patient_id = %s ORDER BY queue_id", (patient_id,))
+        assert [row['status'] for row in rows] == ['completed', 'in_consultation']
+    finally:
+        for table in ('opd_queue', 'live_events', 'daily_rollups', 'patients'):
+            execute(f"DELETE FROM {table}")
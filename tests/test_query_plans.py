@@ -0,0 +1,77 @@
+"""``query-plan-check`` against a seeded schema: no route may full-scan a large table."""
+import pytest
+
+PATIENTS = 4096
+MIN_ROWS = 1000
+DEPARTMENTS = ('General Medicine', 'Cardiology', 'Orthopedics', 'Neurology')
+# Counters taken back to zero leave their row behind
+ROLLUPS = """
+    SELECT * FROM daily_rollups
+    WHERE registrations OR consultations OR admissions OR discharges OR waits
+    ORDER BY day, department
+"""
+
+
+@pytest.fixture
+def seeded(execute):
+    """Production-like volumes in patients, opd_queue and patient_appointments."""
+    try:
+        values = ', '.join(['(%s, 40, %s, %s, %s)'] * len(DEPARTMENTS))
+        params = []
+        for department in DEPARTMENTS:
+            params += [f"Seed {department}", '9000000000', department, 'Waiting']
+        execute(f"INSERT INTO patients (name, age, phone, department, status) VALUES {values}", params)
+        while execute("SELECT COUNT(*) AS n FROM patients")[0]['n'] < PATIENTS:
+            execute(
+                """
+                INSERT INTO patients (name, age, phone, department, status, registration_date)
+                SELECT CONCAT(name, ' ', patient_id), age, phone, department,
+                       ELT(1 + patient_id % 4, 'Waiting', 'Completed', 'Admitted', 'Discharged'),
+                       registration_date - INTERVAL patient_id % 90 DAY
+                FROM patients
+                """
+            )
+        execute(
+            """
+            INSERT INTO opd_queue (patient_id, department, status, token)
+            SELECT patient_id, department, LOWER(status), patient_id FROM patients
+            """
+        )
+        execute(
+            """
+            INSERT INTO patient_appointments (patient_id, token_number, department, appointment_date, status)
+            SELECT patient_id, CONCAT('T', patient_id), department, DATE(registration_date), status FROM patients
+            """
+        )
+        execute(
+            "INSERT INTO beds (bed_name, bed_number, ward, status) VALUES (%s, %s, %s, %s), (%s, %s, %s, %s)",
+            ('GEN-01', 'GEN-01', 'General Ward', 'Available', 'GEN-02', 'GEN-02', 'General Ward', 'Available')
+        )
+        for table in ('patients', 'opd_queue', 'patient_appointments', 'beds'):
+            execute(f"ANALYZE TABLE {table}")
+        yield
+    finally:
+        for table in ('beds', 'opd_queue', 'patient_appointments', 'patients', 'daily_rollups'):
+            execute(f"DELETE FROM {table}")
+
+
+def test_routes_do_not_full_scan_large_tables(seeded, mediflow):
+    requests, statements, findings = mediflow.run_plan_check(MIN_ROWS, log=lambda message: None)
+    assert requests and statements
+    assert not findings, [(f['table'], f['routes'], f['sql'][:120]) for f in findings]
+
+
+def test_write_probes_only_touch_their_own_patient(seeded, mediflow, execute):
+    patients = execute("SELECT patient_id, status, bed_id, updated_at FROM patients ORDER BY patient_id")
+    rollups = execute(ROLLUPS)
+    beds = execute("SELECT bed_id, status, patient_id FROM beds ORDER BY bed_id")
+
+    requests, statements, findings = mediflow.run_plan_check(MIN_ROWS, include_writes=True, log=lambda message: None)
+
+    assert not findings, [(f['table'], f['routes'], f['sql'][:120]) for f in findings]
+    routes = {route for entry in statements.values() for route in entry['routes']}
+    assert any(route.startswith('POST /admit-patient/') for route in routes)
+    assert execute("SELECT patient_id, status, bed_id, updated_at FROM patients ORDER BY patient_id") == patients
+    assert execute(ROLLUPS) == rollups
+    assert execute("SELECT bed_id, status, patient_id FROM beds ORDER BY bed_id") == beds
+    assert not execute("SELECT patient_id FROM opd_queue WHERE patient_id NOT IN (SELECT patient_id FROM patients)")
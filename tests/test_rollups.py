@@ -0,0 +1,50 @@
+"""Rollup counters are written from what the handler knows, without reading patients."""
+from datetime import date
+
+import pytest
+from mysql.connector import Error
+
+from rollups import PatientState, bump, tally
+
+
+class RecordingCursor:
+    def __init__(self, fail=None):
+        self.statements = []
+        self.fail = fail
+
+    def execute(self, sql, params=()):
+        if self.fail:
+            raise self.fail
+        self.statements.append((' '.join(sql.split()), list(params)))
+
+
+def test_tally_skips_patients_already_in_the_new_status():
+    patients = [
+        PatientState('Cardiology', 'Waiting', date(2026, 10, 1), 12),
+        PatientState('Cardiology', 'Admitted', date(2026, 10, 1), 30),
+        PatientState('ENT', 'Waiting', date(2026, 10, 2), 5),
+    ]
+    assert tally(patients, 'admissions', new_status='Admitted') == {(None, 'Cardiology'): 1, (None, 'ENT'): 1}
+    assert tally(patients, 'waits') == {(None, 'Cardiology'): (42, 2), (None, 'ENT'): (5, 1)}
+    assert tally(patients, 'registrations', delta=-1) == {
+        (date(2026, 10, 1), 'Cardiology'): -2, (date(2026, 10, 2), 'ENT'): -1,
+    }
+
+
+def test_bump_inserts_values_without_reading_patients():
+    cursor = RecordingCursor()
+    bump(cursor, 'waits', {(None, 'ENT'): (5, 1), (None, 'Cardiology'): (0, 0)})
+    [(sql, params)] = cursor.statements
+    assert 'FROM patients' not in sql and 'SELECT' not in sql
+    assert sql.startswith('INSERT INTO daily_rollups (day, department, wait_minutes, waits) VALUES')
+    assert params == [None, 'ENT', 5, 1]
+
+    cursor = RecordingCursor()
+    bump(cursor, 'admissions', {})
+    assert cursor.statements == []
+
+
+def test_lost_transaction_is_not_swallowed(mediflow):
+    with pytest.raises(Error):
+        mediflow.rollup(RecordingCursor(fail=Error(errno=1213, msg='Deadlock found')), 'admissions', {(None, 'ENT'): 1})
+    mediflow.rollup(RecordingCursor(fail=Error(errno=1146, msg="Table doesn't exist")), 'admissions', {(None, 'ENT'): 1})
@@ -0,0 +1,87 @@
+"""The log pipeline never makes the logging caller wait for the writer."""
+import logging
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+from structured_logging import LogPipeline
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A writer stuck on a full pipe: it blocks its OS thread until released, on
+# a native lock that gevent can't turn into a cooperative wait.
+SCENARIO = textwrap.dedent('''
+    import logging, time
+    from structured_logging import LogPipeline
+
+    try:
+        from gevent.monkey import get_original
+        allocate_lock = get_original('_thread', 'allocate_lock')
+    except ImportError:
+        from _thread import allocate_lock
+
+    class StuckWriter(logging.Handler):
+        def __init__(self):
+            super().__init__()
+            self.unblock = allocate_lock()
+            self.unblock.acquire()
+            self.entered = allocate_lock()
+            self.entered.acquire()
+            self.written = []
+
+        def emit(self, record):
+            if not self.written:
+                self.entered.release()
+                self.unblock.acquire()
+            self.written.append(record.getMessage())
+
+    def run():
+        writer = StuckWriter()
+        pipeline = LogPipeline(queue_size=50, stdout=False, sample_burst=0)
+        pipeline._writers = lambda: [writer]
+        log = logging.getLogger('stuck')
+        log.propagate = False
+        pipeline.install(log)
+        log.info('first')
+        assert writer.entered.acquire(timeout=5), 'writer never started'
+        started = time.monotonic()
+        for i in range(200):
+            log.info('record %s', i)
+        elapsed = time.monotonic() - started
+        assert elapsed < 1.0, f'logging waited {elapsed:.2f}s for a blocked writer'
+        dropped = pipeline.handler.dropped
+        writer.unblock.release()
+        pipeline.stop()
+        # What fitted in the queue is written once the writer moves again
+        assert writer.written == ['first'] + [f'record {i}' for i in range(50)]
+        assert dropped == 150, dropped
+''')
+
+
+def test_blocked_writer_does_not_block_callers():
+    namespace = {}
+    exec(SCENARIO, namespace)
+    namespace['run']()
+
+
+def test_blocked_writer_does_not_block_gevent_workers():
+    pytest.importorskip('gevent')
+    script = "from gevent import monkey; monkey.patch_all()\n" + SCENARIO + "\nrun()\n"
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+
+
+def test_records_are_written_as_json_lines(tmp_path):
+    path = tmp_path / 'app-{pid}.log'
+    pipeline = LogPipeline(log_file=str(path), stdout=False)
+    log = logging.getLogger('json-lines')
+    log.propagate = False
+    pipeline.install(log)
+    log.warning('hello %s', 'world', extra={'bed': 'GEN-01'})
+    pipeline.stop()
+    line = (tmp_path / f'app-{os.getpid()}.log').read_text().strip()
+    assert '"msg": "hello world"' in line and '"bed": "GEN-01"' in line
@@ -0,0 +1,28 @@
+"""Fragments are filed under the data versions their inputs were loaded at."""
+from template_cache import FragmentCache
+
+
+def make_cache():
+    versions = {'beds': '7'}
+    return versions, FragmentCache(lambda channel: (versions[channel], 0.0))
+
+
+def test_event_between_load_and_render_does_not_pin_old_html():
+    versions, cache = make_cache()
+    snapshot = cache.snapshot(['beds'])          # taken before loading
+    data = 'beds at 7'
+    versions['beds'] = '8'                        # an event lands meanwhile
+    assert cache.render('k', ['beds'], lambda: data, snapshot) == 'beds at 7'
+
+    # The next request sees version 8 and renders the new data
+    fresh = cache.snapshot(['beds'])
+    assert cache.render('k', ['beds'], lambda: 'beds at 8', fresh) == 'beds at 8'
+    assert cache.render('k', ['beds'], lambda: 'unused', cache.snapshot(['beds'])) == 'beds at 8'
+    assert cache.hits == 1
+
+
+def test_unknown_or_conflicting_versions_are_not_stored():
+    versions, cache = make_cache()
+    assert cache.render('k', ['beds'], lambda: 'a', {'beds': None}) == 'a'
+    assert cache.render('k', ['beds'], lambda: 'b', {'beds': None}) == 'b'
+    assert cache.hits == 0
@@ -0,0 +1,65 @@
+"""Appointment token codes and per-department sequences."""
+import os
+import re
+from datetime import date
+
+import pytest
+
+from registration import RegistrationError, validate_registration
+from token_allocator import (
+    DEPARTMENT_CODES, TokenCodeCollision, UnknownDepartment, check_codes, department_code, department_key,
+    format_token,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REGISTRATION = {'name': 'A', 'age': '30', 'phone': '9000000000'}
+
+
+def test_departments_sharing_a_prefix_get_their_own_codes():
+    codes = {department: department_code(department) for department in (
+        'General', 'General Medicine', 'General Surgery', 'Neurology', 'Neurosurgery',
+    )}
+    assert len(set(codes.values())) == len(codes), codes
+    assert department_code('') == department_code(None) == DEPARTMENT_CODES['General']
+    assert department_key('  general   medicine ') == 'General Medicine'
+    with pytest.raises(UnknownDepartment):
+        department_code('Oncology')
+
+
+def test_registration_only_accepts_listed_departments():
+    assert validate_registration({**REGISTRATION, 'department': 'semi-private'})['department'] == 'Semi-Private'
+    with pytest.raises(RegistrationError):
+        validate_registration({**REGISTRATION, 'department': 'Oncology'})
+
+
+def test_form_departments_have_codes_the_token_search_recognises():
+    with open(os.path.join(ROOT, 'templates', 'patient_registration.html')) as f:
+        form = f.read()
+    with open(os.path.join(ROOT, 'templates', 'dashboards', 'patient.html')) as f:
+        pattern = re.search(r'const isToken = /(.+)/i\.test', f.read()).group(1)
+    select = form[form.index('<select id="department"'):]
+    select = select[:select.index('</select>')]
+    departments = [value for value in re.findall(r'<option value="([^"]*)"', select) if value]
+    assert departments and all(department_key(d) == d for d in departments)
+    for code in DEPARTMENT_CODES.values():
+        assert re.fullmatch(pattern, format_token(code, 142), re.IGNORECASE), code
+
+
+def test_check_codes_rejects_shared_codes():
+    with pytest.raises(TokenCodeCollision):
+        check_codes({'Neurology': 'NEU', 'Neurosurgery': 'NEU'})
+    with pytest.raises(TokenCodeCollision):
+        check_codes({'ENT': 'ENT', 'Ent': 'ENX'})
+
+
+def test_sequences_are_kept_per_department(mediflow, execute):
+    day = date(2031, 1, 6)
+    try:
+        general = mediflow.allocate_tokens('General', 3, day)
+        medicine = mediflow.allocate_tokens('General Medicine', 2, day)
+        assert general == ['GEN-0001', 'GEN-0002', 'GEN-0003']
+        assert medicine == ['GMD-0001', 'GMD-0002']
+        rows = execute("SELECT department, prefix FROM token_counters WHERE day = %s ORDER BY department", (day,))
+        assert rows == [{'department': 'General', 'prefix': 'GEN'}, {'department': 'General Medicine', 'prefix': 'GMD'}]
+    finally:
+        execute("DELETE FROM token_counters WHERE day = %s", (day,))
@@ -0,0 +1,44 @@
+"""Service time statistics that couldn't be saved are kept for the next write."""
+from wait_estimator import WaitEstimator
+
+
+class FlakyConnect:
+    def __init__(self):
+        self.up = False
+        self.saved = []
+
+    def __call__(self):
+        return FakeDb(self.saved) if self.up else None
+
+
+class FakeDb:
+    def __init__(self, saved):
+        self.saved = saved
+
+    def cursor(self):
+        return self
+
+    def executemany(self, sql, rows):
+        self.saved.extend(rows)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_statistics_survive_a_failed_connection():
+    connect = FlakyConnect()
+    estimator = WaitEstimator(connect)
+    estimator._loaded = True
+    with estimator._lock:
+        estimator._observe(('department', 'ENT'), 12.0)
+
+    estimator.persist()
+    assert estimator._dirty == {('department', 'ENT')}
+
+    connect.up = True
+    estimator.persist()
+    assert [row[:3] for row in connect.saved] == [('department', 'ENT', 12.0)]
+    assert not estimator._dirty
@@ -0,0 +1,146 @@
+"""Sequential appointment tokens per department and day, e.g. ``CAR-0142``.
+
+Numbers come from a ``token_counters`` row per (department, day). A worker
+reserves a block of numbers with one auto-committed statement,
+
+    INSERT ... ON DUPLICATE KEY UPDATE last_value = LAST_INSERT_ID(last_value + n)
+
+and hands them out from memory, so registrations don't queue up on the
+counter row lock and the row is only touched once per block. Tokens are
+unique per appointment day (enforced by a unique index on
+``patient_appointments (token_number, appointment_date)``); because each
+worker draws from its own block they are increasing per worker, not
+strictly in registration order across workers, and numbers left in a
+block when a worker exits are skipped.
+
+Each department has its own three letter code in ``DEPARTMENT_CODES``, so
+two departments never draw from one sequence or hand out the same token.
+Registration only accepts departments listed there; a new department
+needs a code added before patients can be registered to it.
+"""
+import re
+import threading
+from datetime import date
+
+DEFAULT_BLOCK_SIZE = 20
+# Registrations without a department are counted as General
+FALLBACK_DEPARTMENT = 'General'
+
+# Department -> token code. Codes must be unique; check_codes() runs on import.
+DEPARTMENT_CODES = {
+    'General': 'GEN',
+    'General Medicine': 'GMD',
+    'General Surgery': 'GSU',
+    'General Ward': 'GWD',
+    'Semi-Private': 'SPV',
+    'Private': 'PVT',
+    'OPD': 'OPD',
+    'ICU': 'ICU',
+    'Emergency': 'EMR',
+    'Cardiology': 'CAR',
+    'Orthopedics': 'ORT',
+    'Neurology': 'NEU',
+    'Neurosurgery': 'NSU',
+    'Pediatrics': 'PED',
+    'Dermatology': 'DER',
+    'ENT': 'ENT',
+    'Ophthalmology': 'OPH',
+    'Other': 'OTH',
+}
+
+
+class TokenCodeCollision(ValueError):
+    """Two departments would hand out tokens with the same code."""
+
+
+class UnknownDepartment(ValueError):
+    """The department has no token code in DEPARTMENT_CODES."""
+
+
+def department_key(department):
+    """Canonical department name the counter is kept under, or None if it isn't listed."""
+    name = ' '.join(str(department or '').split()) or FALLBACK_DEPARTMENT
+    return _KNOWN.get(name.casefold())
+
+
+def department_code(department):
+    """Token code of a department: 'Cardiology' -> 'CAR', 'Neurosurgery' -> 'NSU'."""
+    key = department_key(department)
+    if key is None:
+        raise UnknownDepartment(f"no token code for department {department!r}")
+    return DEPARTMENT_CODES[key]
+
+
+def check_codes(codes):
+    """Raise TokenCodeCollision unless every department in ``codes`` has its own code."""
+    owners = {}
+    for department, code in codes.items():
+        if not re.fullmatch(r'[A-Z]{3}', code):
+            raise TokenCodeCollision(f"token code {code!r} of {department!r} must be three capital letters")
+        if code in owners:
+            raise TokenCodeCollision(f"{department!r} and {owners[code]!r} share token code {code!r}")
+        owners[code] = department
+    folded = [department.casefold() for department in codes]
+    if len(set(folded)) != len(folded):
+        raise TokenCodeCollision("department names in DEPARTMENT_CODES differ only by case")
+
+
+check_codes(DEPARTMENT_CODES)
+_KNOWN = {department.casefold(): department for department in DEPARTMENT_CODES}
+
+
+def format_token(code, number):
+    return f"{code}-{number:04d}"
+
+
+class TokenAllocator:
+    def __init__(self, connect, block_size=DEFAULT_BLOCK_SIZE):
+        self._connect = connect
+        self.block_size = max(1, int(block_size))
+        self._blocks = {}         # (department, day) -> [next number, last number]
+        self._lock = threading.Lock()
+
+    def allocate(self, department, count=1, day=None):
+        """Return ``count`` new tokens for ``department`` on ``day`` (default today)."""
+        day = day or date.today()
+        code = department_code(department)
+        department = department_key(department)
+        key = (department, day)
+        tokens = []
+        with self._lock:
+            while len(tokens) < count:
+                block = self._blocks.get(key)
+                if block is None or block[0] > block[1]:
+                    size = max(self.block_size, count - len(tokens))
+                    last = self._reserve(department, code, day, size)
+                    block = self._blocks[key] = [last - size + 1, last]
+                    self._forget_before(date.today())
+                take = min(count - len(tokens), block[1] - block[0] + 1)
+                tokens.extend(format_token(code, n) for n in range(block[0], block[0] + take))
+                block[0] += take
+        return tokens
+
+    def _reserve(self, department, code, day, size):
+        """Claim ``size`` numbers in the database; returns the last one."""
+        db = self._connect()
+        try:
+            cursor = db.cursor()
+            cursor.execute(
+                """
+                INSERT INTO token_counters (department, day, prefix, last_value)
+                VALUES (%s, %s, %s, LAST_INSERT_ID(%s))
+                ON DUPLICATE KEY UPDATE last_value = LAST_INSERT_ID(last_value + %s)
+                """,
+                (department, day, code, size, size)
+            )
+            cursor.execute("SELECT LAST_INSERT_ID()")
+            last = int(cursor.fetchone()[0])
+            db.commit()
+            cursor.close()
+        finally:
+            db.close()
+        return last
+
+    def _forget_before(self, today):
+        for key in [k for k in self._blocks if k[1] < today]:
+            del self._blocks[key]
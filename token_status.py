@@ -0,0 +1,164 @@
+"""Token -> patient, appointment and queue state for the public status lookup.
+
+Patients' phones poll ``/api/queue-status-by-token`` on a timer. One query
+resolves a token (or a patient id) to the patient, their appointment and
+their latest OPD queue row together, and the result is kept in a small
+per-worker cache that the live event feed invalidates whenever one of the
+patient's queue rows or details changes. Repeated polls for the same token
+are then answered from memory; the queue position itself comes from the
+in-memory queue index and is never cached.
+"""
+import threading
+
+from cache import TTLCache
+
+_STATE_COLUMNS = """
+    p.patient_id, p.name, p.department, p.assigned_doctor,
+    pa.id AS appointment_id, pa.token_number, pa.department AS appointment_department,
+    pa.appointment_date, pa.appointment_time, pa.status AS appointment_status, pa.queue_position,
+    q.queue_id, q.status AS queue_status
+"""
+
+# Latest queue row of the patient; MAX() is read from idx_opd_queue_patient.
+_LATEST_QUEUE_JOIN = """
+    LEFT JOIN opd_queue q
+      ON q.queue_id = (SELECT MAX(queue_id) FROM opd_queue WHERE patient_id = p.patient_id)
+"""
+
+# Tokens repeat from day to day: prefer today's or the next upcoming
+# appointment, then the most recent past one.
+RESOLVE_TOKEN_SQL = f"""
+    SELECT {_STATE_COLUMNS}
+    FROM patient_appointments pa
+    LEFT JOIN patients p ON p.patient_id = pa.patient_id
+    {_LATEST_QUEUE_JOIN}
+    WHERE pa.token_number IN (%s, %s)
+    ORDER BY pa.appointment_date < CURDATE(), ABS(DATEDIFF(pa.appointment_date, CURDATE())), pa.id DESC
+    LIMIT 1
+"""
+
+RESOLVE_PATIENT_SQL = f"""
+    SELECT {_STATE_COLUMNS}
+    FROM patients p
+    LEFT JOIN patient_appointments pa
+      ON pa.id = (SELECT MAX(id) FROM patient_appointments WHERE patient_id = p.patient_id)
+    {_LATEST_QUEUE_JOIN}
+    WHERE p.patient_id = %s
+"""
+
+# Legacy lookups by OPD queue number, for tokens that are no appointment token.
+RESOLVE_QUEUE_SQL = """
+    SELECT p.patient_id, p.name, p.department, p.assigned_doctor,
+           NULL AS appointment_id, NULL AS token_number, NULL AS appointment_department,
+           NULL AS appointment_date, NULL AS appointment_time, NULL AS appointment_status,
+           NULL AS queue_position, q.queue_id, q.status AS queue_status
+    FROM opd_queue q
+    LEFT JOIN patients p ON p.patient_id = q.patient_id
+    WHERE q.queue_id = %s
+"""
+
+
+def normalize_token(token):
+    return ' '.join(str(token or '').split()).upper()
+
+
+def _plain(token):
+    """'TOK-12345' -> '12345' (tokens issued before the sequential allocator)."""
+    return token[4:] if token.startswith('TOK-') else token
+
+
+def _date(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _time(value):
+    if hasattr(value, 'total_seconds'):
+        # TIME columns come back as timedelta
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+    if hasattr(value, 'strftime'):
+        return value.strftime('%H:%M')
+    return value
+
+
+def _state(row):
+    if not row:
+        return None
+    row = dict(row)
+    row['appointment_date'] = _date(row.get('appointment_date'))
+    row['appointment_time'] = _time(row.get('appointment_time'))
+    return row
+
+
+def resolve_token(cursor, token):
+    """State for an appointment token (or legacy queue number), or None."""
+    token = normalize_token(token)
+    cursor.execute(RESOLVE_TOKEN_SQL, (token, _plain(token)))
+    row = cursor.fetchone()
+    if not row and _plain(token).isdigit():
+        cursor.execute(RESOLVE_QUEUE_SQL, (int(_plain(token)),))
+        row = cursor.fetchone()
+    return _state(row)
+
+
+def resolve_patient(cursor, patient_id):
+    """State for a patient's latest appointment and queue row, or None."""
+    cursor.execute(RESOLVE_PATIENT_SQL, (patient_id,))
+    return _state(cursor.fetchone())
+
+
+class TokenStatusCache:
+    """Resolved states keyed by lookup, dropped when the patient's state changes.
+
+    The TTL only bounds staleness for changes that publish no event. Lookups
+    come from a public endpoint, so at most ``max_entries`` states are kept
+    (least recently used go first) and unknown tokens are never stored.
+    """
+
+    def __init__(self, ttl=30.0, max_entries=10000):
+        self._cache = TTLCache(ttl, max_entries=max_entries)
+        self._lock = threading.Lock()
+        self._keys = {}           # patient_id -> cache keys resolved to that patient
+        self._generation = 0
+
+    def get_or_load(self, key, loader):
+        generation = self._generation
+        state = self._cache.get_or_load(key, loader)
+        if state is None:
+            return None
+        with self._lock:
+            if generation != self._generation:
+                # Something changed while we were loading; serve it but don't keep it.
+                self._cache.invalidate(key)
+            elif state.get('patient_id') is not None:
+                keys = self._keys.setdefault(state['patient_id'], set())
+                keys.add(key)
+                if len(keys) > 16:
+                    self._prune_keys([state['patient_id']])
+                if len(self._keys) > self._cache.max_entries:
+                    self._prune_keys(list(self._keys))
+        return state
+
+    def _prune_keys(self, patient_ids):
+        # Forget lookups the cache has already evicted or expired.
+        for patient_id in patient_ids:
+            live = {key for key in self._keys[patient_id] if key in self._cache}
+            if live:
+                self._keys[patient_id] = live
+            else:
+                del self._keys[patient_id]
+
+    def apply_event(self, event):
+        """Live event feed listener for the ``opd_queue`` and ``patients`` channels."""
+        patient_id = event.get('patient_id')
+        with self._lock:
+            self._generation += 1
+            keys = self._keys.pop(patient_id, ()) if patient_id is not None else ()
+        for key in keys:
+            self._cache.invalidate(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._keys.clear()
+        self._cache.invalidate()
@@ -0,0 +1,278 @@
+"""Learned consultation times for OPD wait estimates.
+
+Every worker follows the ``opd_queue`` channel of the live event feed: a
+patient moving to ``in_consultation`` starts a clock, moving on to
+``completed`` stops it, and the duration (taken from the events' database
+timestamps, so all workers learn the same numbers) updates the statistics
+of the doctor, the department and the hospital in O(1): an exponentially
+weighted mean plus a ring of recent samples for percentiles, which are
+sorted lazily at most once per new sample.
+
+Estimates are read from memory only. A background thread per worker
+loads ``service_time_stats`` at start-up, so a new worker doesn't begin
+from the prior, and writes the statistics back every few minutes; the feed
+thread never waits on the database.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from mysql.connector import Error
+
+logger = logging.getLogger(__name__)
+
+PRIOR_MINUTES = 15.0
+MIN_SAMPLES = 5               # below this a scope falls back to the next broader one
+MIN_MINUTES, MAX_MINUTES = 0.5, 240.0   # longer means someone forgot to press "complete"
+RECENT_SAMPLES = 200
+ACTIVE_DOCTOR_SECONDS = 2 * 3600
+
+
+class ServiceTime:
+    """EWMA and recent samples of one scope (a doctor, a department, the hospital)."""
+
+    __slots__ = ('ewma', 'samples', 'recent', '_next', '_sorted')
+
+    def __init__(self, ewma=None, samples=0, recent=None):
+        self.ewma = ewma
+        self.samples = samples
+        self.recent = list(recent or [])[-RECENT_SAMPLES:]
+        self._next = len(self.recent) % RECENT_SAMPLES
+        self._sorted = None
+
+    def add(self, minutes, alpha):
+        self.ewma = minutes if self.ewma is None else alpha * minutes + (1 - alpha) * self.ewma
+        self.samples += 1
+        if len(self.recent) < RECENT_SAMPLES:
+            self.recent.append(minutes)
+        else:
+            self.recent[self._next] = minutes
+        self._next = (self._next + 1) % RECENT_SAMPLES
+        self._sorted = None
+
+    def ordered(self):
+        """Recent samples, oldest first."""
+        if len(self.recent) < RECENT_SAMPLES:
+            return list(self.recent)
+        return self.recent[self._next:] + self.recent[:self._next]
+
+    def percentile(self, fraction):
+        if not self.recent:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self.recent)
+        return self._sorted[min(len(self._sorted) - 1, int(fraction * len(self._sorted)))]
+
+
+def _timestamp(value):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return None
+    return value.timestamp() if hasattr(value, 'timestamp') else None
+
+
+class WaitEstimator:
+    def __init__(self, connect, alpha=0.2, persist_seconds=300):
+        self._connect = connect
+        self.alpha = alpha
+        self.persist_seconds = persist_seconds
+        self._lock = threading.Lock()
+        self._stats = {}          # (scope, key) -> ServiceTime
+        self._started = {}        # patient_id -> (timestamp, department, doctor)
+        self._doctor_seen = {}    # department -> {doctor: timestamp of last completion}
+        self._dirty = set()
+        self._loaded = False
+        self._load_after = 0.0
+        self._load_lock = threading.Lock()
+        self._pid = None
+
+    # ---- learning ----------------------------------------------------
+    def apply_event(self, event):
+        """Live event feed listener for the ``opd_queue`` channel."""
+        self.start()
+        patient_id = event.get('patient_id')
+        payload = event.get('payload') or {}
+        status = (payload.get('queue_status') or '').lower()
+        if patient_id is None:
+            return
+        at = _timestamp(event.get('created_at')) or time.time()
+        department = event.get('department') or payload.get('department') or ''
+        doctor = payload.get('assigned_doctor') or ''
+        with self._lock:
+            if status == 'in_consultation' and event.get('type') != 'removed':
+                self._started.setdefault(patient_id, (at, department, doctor))
+                return
+            started = self._started.pop(patient_id, None)
+            if started is None or status != 'completed':
+                return
+            minutes = (at - started[0]) / 60.0
+            if not MIN_MINUTES <= minutes <= MAX_MINUTES:
+                return
+            doctor = doctor or started[2]
+            self._observe(('hospital', ''), minutes)
+            self._observe(('department', department), minutes)
+            if doctor:
+                self._observe(('doctor', doctor), minutes)
+                self._doctor_seen.setdefault(department, {})[doctor] = at
+
+    def _observe(self, key, minutes):
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = ServiceTime()
+        stats.add(minutes, self.alpha)
+        self._dirty.add(key)
+
+    # ---- estimates ---------------------------------------------------
+    def _scope(self, department, doctor):
+        for key in (('doctor', doctor), ('department', department), ('hospital', '')):
+            stats = self._stats.get(key)
+            if key[1] is not None and stats is not None and stats.samples >= MIN_SAMPLES:
+                return stats
+        return None
+
+    def service_minutes(self, department=None, doctor=None, fraction=None):
+        """Typical consultation length (EWMA, or a percentile of recent ones)."""
+        self.ensure_loaded()
+        with self._lock:
+            stats = self._scope(department or '', doctor or None)
+            if stats is None:
+                return PRIOR_MINUTES
+            value = stats.ewma if fraction is None else stats.percentile(fraction)
+        return value if value is not None else PRIOR_MINUTES
+
+    def active_doctors(self, department):
+        """Doctors of ``department`` who finished a consultation in the last two hours."""
+        cutoff = time.time() - ACTIVE_DOCTOR_SECONDS
+        with self._lock:
+            seen = self._doctor_seen.get(department or '', {})
+            return max(1, sum(1 for at in seen.values() if at >= cutoff))
+
+    def estimate(self, people_ahead, department=None, doctor=None):
+        """``(minutes, p90_minutes)`` until the patient is seen, or (None, None)."""
+        if people_ahead is None or people_ahead < 0:
+            return None, None
+        if people_ahead == 0:
+            return 0, 0
+        # With a named doctor the patient waits for that doctor only.
+        parallel = 1 if doctor else self.active_doctors(department)
+        typical = self.service_minutes(department, doctor)
+        slow = self.service_minutes(department, doctor, fraction=0.9)
+        return (int(round(people_ahead * typical / parallel)),
+                int(round(people_ahead * max(slow, typical) / parallel)))
+
+    # ---- persistence -------------------------------------------------
+    def start(self):
+        """Start the thread that loads and saves the statistics (again, in a forked worker)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name='wait-stats', daemon=True).start()
+
+    def _run(self):
+        self.ensure_loaded()
+        while True:
+            time.sleep(self.persist_seconds)
+            try:
+                self.persist()
+            except Exception as e:
+                logger.warning("Service time statistics thread error: %s", e, exc_info=True)
+
+    def ensure_loaded(self):
+        if self._loaded or time.monotonic() < self._load_after:
+            return
+        # Another thread is loading; estimates use what is in memory meanwhile.
+        if not self._load_lock.acquire(blocking=False):
+            return
+        try:
+            if not self._loaded:
+                self._load()
+        finally:
+            self._load_lock.release()
+
+    def _load(self):
+        # One attempt a minute while the database is unavailable
+        self._load_after = time.monotonic() + 60
+        db = self._connect()
+        if not db:
+            return
+        try:
+            cursor = db.cursor()
+            cursor.execute("SELECT scope, scope_key, ewma_minutes, samples, recent FROM service_time_stats")
+            rows = cursor.fetchall()
+            cursor.close()
+        except Error as e:
+            logger.warning("Could not load service time statistics: %s", e)
+            return
+        finally:
+            db.close()
+        with self._lock:
+            for scope, key, ewma, samples, recent in rows:
+                try:
+                    recent = json.loads(recent or '[]')
+                except ValueError:
+                    recent = []
+                stats = ServiceTime(ewma, int(samples or 0), recent)
+                live = self._stats.get((scope, key))
+                if live is not None:
+                    # Consultations completed before the history arrived
+                    # continue it instead of replacing it.
+                    for minutes in live.ordered():
+                        stats.add(minutes, self.alpha)
+                    stats.samples += live.samples - len(live.recent)
+                self._stats[(scope, key)] = stats
+            self._loaded = True
+        logger.info("Loaded service time statistics for %s scopes", len(rows))
+
+    def persist(self):
+        """Write the statistics that changed since the last write.
+
+        Nothing is written until the stored history has been loaded, so a
+        few fresh samples never overwrite it.
+        """
+        self.ensure_loaded()
+        if not self._loaded:
+            return
+        with self._lock:
+            rows = [
+                (scope, key, self._stats[(scope, key)].ewma, self._stats[(scope, key)].samples,
+                 json.dumps([round(m, 2) for m in self._stats[(scope, key)].ordered()]))
+                for scope, key in self._dirty
+            ]
+            self._dirty = set()
+        if not rows:
+            return
+        db = self._connect()
+        if not db:
+            self._keep_dirty(rows)
+            return
+        try:
+            cursor = db.cursor()
+            cursor.executemany(
+                """
+                INSERT INTO service_time_stats (scope, scope_key, ewma_minutes, samples, recent)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE ewma_minutes = VALUES(ewma_minutes),
+                    samples = VALUES(samples), recent = VALUES(recent)
+                """,
+                rows
+            )
+            db.commit()
+            cursor.close()
+        except Error as e:
+            logger.warning("Could not save service time statistics: %s", e)
+            self._keep_dirty(rows)
+        finally:
+            db.close()
+
+    def _keep_dirty(self, rows):
+        # Written with the next persist()
+        with self._lock:
+            self._dirty.update((scope, key) for scope, key, _, _, _ in rows)
@@ -0,0 +1,77 @@
+"""Patient load per department and free beds per ward, from one query.
+
+Beds are grouped by ward and active patients by department in a single
+``UNION ALL`` statement (one round trip, both halves served by the status
+indexes). Departments are joined to the ward they admit into through the
+bed allocator's mapping, so a department card can show its real free beds.
+"""
+from bed_allocator import FALLBACK_WARD, WARD_MAPPING, ward_for_department
+
+# Patients counted as load on their department's OPD.
+ACTIVE_STATUSES = ('Waiting', 'In Queue', 'In Consultation', 'Consulted')
+
+CAPACITY_SQL = f"""
+    SELECT 'ward' AS kind, COALESCE(ward, '') AS name, COUNT(*) AS total,
+           SUM(status = 'available') AS available, SUM(status = 'occupied') AS occupied,
+           0 AS waiting, 0 AS admitted
+    FROM beds
+    GROUP BY ward
+    UNION ALL
+    SELECT 'department', COALESCE(department, ''), SUM(status IN ({', '.join(['%s'] * len(ACTIVE_STATUSES))})),
+           0, 0, SUM(status IN ('Waiting', 'In Queue')), SUM(status = 'Admitted')
+    FROM patients
+    WHERE status IN ({', '.join(['%s'] * (len(ACTIVE_STATUSES) + 1))})
+    GROUP BY department
+"""
+
+
+def compute_capacity(db, departments=None):
+    """``{'departments': [...], 'wards': [...]}`` for the hospital dashboard.
+
+    ``departments`` are always listed, even without patients; others show
+    up as soon as they have some. Wards come from the beds table.
+    """
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(CAPACITY_SQL, ACTIVE_STATUSES + ACTIVE_STATUSES + ('Admitted',))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    wards = {}
+    loads = {name: {'patients': 0, 'waiting': 0, 'admitted': 0}
+             for name in (departments if departments is not None else WARD_MAPPING)}
+    for row in rows:
+        if row['kind'] == 'ward':
+            wards[row['name']] = {
+                'ward': row['name'],
+                'total_beds': int(row['total'] or 0),
+                'free_beds': int(row['available'] or 0),
+                'occupied_beds': int(row['occupied'] or 0),
+                'departments': [],
+            }
+        elif row['name']:
+            loads[row['name']] = {
+                'patients': int(row['total'] or 0),
+                'waiting': int(row['waiting'] or 0),
+                'admitted': int(row['admitted'] or 0),
+            }
+
+    department_rows = []
+    for name, load in loads.items():
+        ward = ward_for_department(name)
+        if ward in wards:
+            wards[ward]['departments'].append(name)
+        department_rows.append({
+            'name': name,
+            'ward': ward,
+            'available': wards[ward]['free_beds'] if ward in wards else 0,
+            **load,
+        })
+    department_rows.sort(key=lambda d: (-d['patients'], d['name']))
+
+    ward_rows = sorted(wards.values(), key=lambda w: (w['ward'] == FALLBACK_WARD, w['ward']))
+    for ward in ward_rows:
+        ward['occupancy_rate'] = (round(ward['occupied_beds'] / ward['total_beds'] * 100, 1)
+                                  if ward['total_beds'] else 0)
+    return {'departments': department_rows, 'wards': ward_rows}